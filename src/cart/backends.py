@@ -0,0 +1,311 @@
+# cart/backends.py
+"""
+Хранилища корзины.
+
+Вьюхи, get_cart, шапка и оформление заказа работают с корзиной через
+get_cart_backend(request); какой класс отвечает, задают настройки:
+  * CART_USER_BACKEND — для авторизованных (по умолчанию БД: Cart/CartItem);
+  * CART_GUEST_BACKEND — для гостей (с Redis — кэш, без него — тоже БД).
+
+Гостевая корзина в кэше — один ключ {"v": версия, "lines": {product_id:
+[qty, цена]}} с TTL; в таблицы она не пишет. В БД её содержимое попадает только при
+оформлении (сразу позициями заказа) или при логине (слиянием в корзину
+пользователя, см. flush_guest_cart).
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from catalog.models import Product
+from catalog.translations import prefetch_translations
+from .models import Cart, CartItem
+from .services import (
+    SESSION_CART_KEY, _ensure_session_key, _get_or_create_cart_for_request,
+    clear_cart, merge_guest_cart, merge_lines, refresh_cart_totals,
+)
+
+GUEST_CART_TTL = 14 * 24 * 3600
+
+
+class DatabaseCartBackend:
+    """Корзина в Cart/CartItem: пользователь — по user, гость — по токену в сессии."""
+
+    def __init__(self, request):
+        self.request = request
+        self._cart = None
+
+    @property
+    def cart(self) -> Cart:
+        if self._cart is None:
+            self._cart = _get_or_create_cart_for_request(self.request)
+        return self._cart
+
+    def _lookup_filter(self):
+        """Условие поиска корзины без создания; None — корзины быть не может."""
+        user = getattr(self.request, "user", None)
+        if user is not None and user.is_authenticated:
+            # гостевая корзина слита при логине (cart.signals)
+            return Q(user=user)
+        session = getattr(self.request, "session", None)
+        guest_key = session.get(SESSION_CART_KEY) if session is not None else None
+        if guest_key:
+            return Q(user__isnull=True, session_key=guest_key)
+        return None
+
+    def version(self) -> int:
+        return self.cart.version
+
+    def totals(self) -> tuple:
+        """(число товаров, сумма) из денормализованных итогов; ничего не создаёт."""
+        if self._cart is not None:
+            return self._cart.items_count, self._cart.subtotal
+        cond = self._lookup_filter()
+        if cond is None:
+            return 0, Decimal("0.00")
+        totals = Cart.objects.filter(cond).aggregate(count=Sum("items_count"), subtotal=Sum("subtotal"))
+        return totals["count"] or 0, totals["subtotal"] or Decimal("0.00")
+
+    def items(self) -> list:
+        items = list(CartItem.objects.select_related("product__brand").filter(cart=self.cart).order_by("id"))
+        prefetch_translations(it.product for it in items)
+        return items
+
+    def get_item(self, item_id):
+        return CartItem.objects.select_related("product").filter(pk=item_id, cart=self.cart).first()
+
+    def add(self, product, qty: int) -> None:
+        item, created = self.cart.items.get_or_create(
+            product=product,
+            defaults={"qty": qty, "unit_price_snapshot": product.price}
+        )
+        if not created:
+            item.qty += qty
+            item.save(update_fields=["qty", "updated_at"])
+        refresh_cart_totals(self.cart)
+
+    def set_qty(self, item_id, qty: int):
+        """Меняет количество (qty <= 0 — удаляет). Возвращает позицию или None."""
+        item = self.get_item(item_id)
+        if item is None:
+            return None
+        if qty <= 0:
+            item.delete()
+        else:
+            item.qty = qty
+            item.save(update_fields=["qty", "updated_at"])
+        refresh_cart_totals(self.cart)
+        return item
+
+    def update_many(self, changes: dict) -> tuple:
+        """
+        Меняет количества сразу у нескольких позиций {item_id: qty} одной
+        транзакцией: количество ограничивается остатком, qty < 1 — удаление.
+        Возвращает (изменённые позиции, id удалённых); чужие id пропускаются.
+        Позиции читаются под блокировкой строк (только CartItem, не товары) —
+        параллельное изменение той же корзины ждёт, а не затирается.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            items = list(
+                CartItem.objects.select_related("product").select_for_update(of=("self",))
+                .filter(cart=self.cart, pk__in=changes)
+            )
+            to_update, removed = [], []
+            for item in items:
+                qty = min(changes[item.pk], item.product.in_stock)
+                if qty < 1:
+                    removed.append(item.pk)
+                elif qty != item.qty:
+                    item.qty = qty
+                    item.updated_at = now
+                    to_update.append(item)
+            if to_update:
+                CartItem.objects.bulk_update(to_update, ["qty", "updated_at"])
+            if removed:
+                CartItem.objects.filter(cart=self.cart, pk__in=removed).delete()
+            if to_update or removed:
+                refresh_cart_totals(self.cart)
+        return [it for it in items if it.pk not in removed], removed
+
+    def remove(self, item_id) -> bool:
+        deleted, _ = CartItem.objects.filter(pk=item_id, cart=self.cart).delete()
+        if deleted:
+            refresh_cart_totals(self.cart)
+        return bool(deleted)
+
+    def clear(self) -> None:
+        clear_cart(self.cart)
+
+
+class CartLine:
+    """Позиция гостевой корзины из кэша; атрибуты как у CartItem, id = id товара."""
+
+    def __init__(self, product, qty: int, unit_price_snapshot: Decimal):
+        self.id = product.pk
+        self.product = product
+        self.product_id = product.pk
+        self.qty = qty
+        self.unit_price_snapshot = unit_price_snapshot
+
+    def line_total(self):
+        return self.unit_price_snapshot * self.qty
+
+
+class CacheCartBackend:
+    """Гостевая корзина одним ключом в кэше с TTL — без строк в БД."""
+
+    def __init__(self, request):
+        self.request = request
+        self._data = None
+
+    def _token(self, create=False):
+        session = getattr(self.request, "session", None)
+        if session is None:
+            return None
+        if create:
+            return _ensure_session_key(self.request)
+        return session.get(SESSION_CART_KEY)
+
+    @staticmethod
+    def cache_key(token) -> str:
+        return f"cart:guest:{token}"
+
+    def _load(self) -> dict:
+        if self._data is None:
+            token = self._token()
+            self._data = (cache.get(self.cache_key(token)) if token else None) or {"v": 0, "lines": {}}
+        return self._data
+
+    def _lines(self) -> dict:
+        return self._load()["lines"]
+
+    def _save(self) -> None:
+        token = self._token(create=True)
+        self._data["v"] += 1
+        ttl = getattr(settings, "GUEST_CART_TTL", GUEST_CART_TTL)
+        cache.set(self.cache_key(token), self._data, ttl)
+
+    def version(self) -> int:
+        return self._load()["v"]
+
+    def lines(self) -> list:
+        """[(product_id, qty, цена)] без обращения к БД."""
+        return [(int(pk), qty, Decimal(price)) for pk, (qty, price) in self._lines().items()]
+
+    def totals(self) -> tuple:
+        lines = self.lines()
+        return sum(qty for _pk, qty, _price in lines), sum((qty * price for _pk, qty, price in lines), Decimal("0.00"))
+
+    def items(self) -> list:
+        lines = self.lines()
+        if not lines:
+            return []
+        products = Product.objects.select_related("brand").in_bulk([pk for pk, _qty, _price in lines])
+        prefetch_translations(products.values())
+        return [
+            CartLine(products[pk], qty, price)
+            for pk, qty, price in lines if pk in products
+        ]
+
+    def get_item(self, item_id):
+        entry = self._lines().get(str(item_id))
+        if entry is None:
+            return None
+        product = Product.objects.filter(pk=item_id).first()
+        return CartLine(product, entry[0], Decimal(entry[1])) if product else None
+
+    def add(self, product, qty: int) -> None:
+        data = self._lines()
+        key = str(product.pk)
+        if key in data:
+            data[key][0] += qty
+        else:
+            data[key] = [qty, str(product.price)]
+        self._save()
+
+    def set_qty(self, item_id, qty: int):
+        item = self.get_item(item_id)
+        if item is None:
+            return None
+        data = self._lines()
+        if qty <= 0:
+            data.pop(str(item_id), None)
+        else:
+            data[str(item_id)][0] = qty
+            item.qty = qty
+        self._save()
+        return item
+
+    def update_many(self, changes: dict) -> tuple:
+        """То же, что DatabaseCartBackend.update_many; остатки — одним запросом."""
+        data = self._lines()
+        ids = [pk for pk in changes if str(pk) in data]
+        products = Product.objects.in_bulk(ids)
+        updated, removed = [], []
+        for pk in ids:
+            product = products.get(pk)
+            qty = min(changes[pk], product.in_stock) if product else 0
+            if qty < 1:
+                data.pop(str(pk))
+                removed.append(pk)
+            else:
+                data[str(pk)][0] = qty
+                updated.append(CartLine(product, qty, Decimal(data[str(pk)][1])))
+        if updated or removed:
+            self._save()
+        return updated, removed
+
+    def remove(self, item_id) -> bool:
+        data = self._lines()
+        if data.pop(str(item_id), None) is None:
+            return False
+        self._save()
+        return True
+
+    def clear(self) -> None:
+        token = self._token()
+        if token:
+            # при оформлении ключ удаляется только после коммита заказа
+            key = self.cache_key(token)
+            transaction.on_commit(lambda: cache.delete(key))
+        self._data = {"v": self.version() + 1, "lines": {}}
+
+
+def get_cart_backend(request):
+    """Хранилище корзины для запроса; один экземпляр на запрос."""
+    backend = getattr(request, "_cart_backend", None)
+    if backend is None:
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            path = getattr(settings, "CART_USER_BACKEND", "cart.backends.DatabaseCartBackend")
+        else:
+            path = getattr(settings, "CART_GUEST_BACKEND", "cart.backends.DatabaseCartBackend")
+        backend = request._cart_backend = import_string(path)(request)
+    return backend
+
+
+def flush_guest_cart(request, user) -> None:
+    """
+    При логине переносит гостевую корзину в корзину пользователя в БД:
+    из кэша — одним upsert позиций, из БД — merge_guest_cart.
+    Вызывается из сигнала user_logged_in (cart.signals).
+    """
+    session = getattr(request, "session", None)
+    token = session.get(SESSION_CART_KEY) if session is not None else None
+    if not token:
+        return
+    key = CacheCartBackend.cache_key(token)
+    data = cache.get(key)
+    if data and data["lines"]:
+        cart, _created = Cart.objects.get_or_create(user=user, defaults={})
+        with transaction.atomic():
+            merge_lines(cart, [(int(pk), qty, Decimal(price)) for pk, (qty, price) in data["lines"].items()])
+            refresh_cart_totals(cart)
+        cache.delete(key)
+    merge_guest_cart(request, user)
+    request._cart_backend = None
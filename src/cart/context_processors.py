@@ -1,16 +1,11 @@
-from .utils import get_or_create_cart
-from .services import _get_or_create_cart_for_request
+from .services import CartSummary, _get_or_create_cart_for_request
 from .models import CartItem
 
 def cart_info(request):
-    try:
-        cart = get_or_create_cart(request)
-        count = sum(i.qty for i in cart.items.all())
-        total = sum((i.unit_price_snapshot * i.qty for i in cart.items.all()), 0)
-    except Exception:
-        count = 0
-        total = 0
-    return {"cart_count": count, "cart_total": total, "cart_items_count": count}
+    # Ленивые значения из денормализованных итогов: ничего не создаём и не пишем,
+    # запрос выполняется, только если шаблон их выводит
+    summary = CartSummary(request)
+    return {"cart_count": summary.count, "cart_total": summary.total, "cart_items_count": summary.count}
 
 def cart_header(request):
     try:
@@ -0,0 +1,82 @@
+# cart/maintenance.py
+"""
+Очистка гостевых данных: брошенные гостевые корзины (с позициями),
+гостевое избранное и истёкшие сессии в БД.
+
+Удаление идёт пачками по первичному ключу: выбираем до batch_size id,
+удаляем их отдельным коротким запросом (автокоммит), повторяем. Блокировки
+держатся только на время одной пачки, а WAL растёт равномерно; между
+пачками можно сделать паузу (GUEST_PURGE_PAUSE).
+
+Гостевые корзины и избранное в кэше (Redis) чистить не нужно — у них TTL.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+from catalog.models import Favorite
+from .models import Cart
+
+PURGE_BATCH = 1000
+
+
+def _retention(name: str, default_days: int) -> timedelta:
+    return timedelta(days=getattr(settings, name, default_days))
+
+
+def _db_sessions() -> bool:
+    return settings.SESSION_ENGINE in (
+        "django.contrib.sessions.backends.db",
+        "django.contrib.sessions.backends.cached_db",
+    )
+
+
+def expired_querysets(now=None) -> dict:
+    """Что подлежит удалению: {название: queryset}."""
+    now = now or timezone.now()
+    querysets = {
+        "carts": Cart.objects.filter(
+            user__isnull=True,
+            updated_at__lt=now - _retention("GUEST_CART_RETENTION_DAYS", 30),
+        ),
+        "favorites": Favorite.objects.filter(
+            user__isnull=True,
+            updated_at__lt=now - _retention("GUEST_FAVORITES_RETENTION_DAYS", 90),
+        ),
+    }
+    if _db_sessions():
+        querysets["sessions"] = Session.objects.filter(expire_date__lt=now)
+    return querysets
+
+
+def delete_in_batches(qs, batch_size: int = PURGE_BATCH, pause: float = 0) -> int:
+    """Удаляет строки queryset пачками по id. Возвращает число удалённых строк модели."""
+    model = qs.model
+    deleted = 0
+    while True:
+        ids = list(qs.order_by("pk").values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        # позиции корзин удаляются каскадом в той же пачке
+        _total, per_model = model.objects.filter(pk__in=ids).delete()
+        deleted += per_model.get(model._meta.label, 0)
+        if len(ids) < batch_size:
+            return deleted
+        if pause:
+            time.sleep(pause)
+
+
+def purge_guest_data(dry_run: bool = False, now=None, batch_size: int = None, pause: float = None) -> dict:
+    """
+    Удаляет просроченные гостевые данные. Возвращает {название: число строк};
+    при dry_run только считает.
+    """
+    batch_size = batch_size or getattr(settings, "GUEST_PURGE_BATCH", PURGE_BATCH)
+    pause = getattr(settings, "GUEST_PURGE_PAUSE", 0) if pause is None else pause
+    report = {}
+    for name, qs in expired_querysets(now).items():
+        report[name] = qs.count() if dry_run else delete_in_batches(qs, batch_size, pause)
+    return report
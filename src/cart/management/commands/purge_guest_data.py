@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from cart.maintenance import purge_guest_data
+
+
+class Command(BaseCommand):
+    help = "Удаляет пачками брошенные гостевые корзины, гостевое избранное и истёкшие сессии."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Только посчитать, что будет удалено.")
+        parser.add_argument("--batch-size", type=int, default=None,
+                            help="Строк в одной пачке (по умолчанию GUEST_PURGE_BATCH).")
+        parser.add_argument("--pause", type=float, default=None,
+                            help="Пауза между пачками в секундах (по умолчанию GUEST_PURGE_PAUSE).")
+
+    def handle(self, *args, **options):
+        report = purge_guest_data(
+            dry_run=options["dry_run"], batch_size=options["batch_size"], pause=options["pause"],
+        )
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+        for name, count in report.items():
+            self.stdout.write(f"{verb} {name}: {count}")
+        self.stdout.write(self.style.SUCCESS("Done."))
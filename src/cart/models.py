@@ -13,10 +13,19 @@ class TimeStamped(models.Model):
 class Cart(TimeStamped):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.CASCADE)
     session_key = models.CharField(max_length=40, null=True, blank=True, db_index=True)
+    # Денормализованные итоги для шапки; пересчитываются после каждого изменения позиций
+    items_count = models.PositiveIntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Растёт при каждом изменении позиций; ключ запомненного расчёта (cart.pricing)
+    version = models.PositiveIntegerField(default=0)
 
     class Meta:
         verbose_name = _("Cart")
         verbose_name_plural = _("Carts")
+        indexes = [
+            # очистка брошенных гостевых корзин (cart.maintenance)
+            models.Index(fields=["updated_at"], name="cart_guest_updated_idx", condition=models.Q(user__isnull=True)),
+        ]
 
 class CartItem(TimeStamped):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
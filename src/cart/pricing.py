@@ -0,0 +1,88 @@
+# cart/pricing.py
+"""
+Расчёт корзины: подытог, скидка по купону, доставка, итог и число товаров.
+
+get_pricing(request, coupon) считает всё за один проход по позициям и
+запоминает результат на запросе с ключом (версия корзины, купон). Версия
+растёт при каждом изменении корзины (Cart.version / счётчик в кэше гостя),
+поэтому после изменения расчёт делается заново, а повторные обращения в том
+же запросе — из памяти. Вьюхи корзины, оформление заказа и шапка читают итоги
+только отсюда.
+"""
+from decimal import Decimal
+
+from orders.models import Coupon
+from .backends import get_cart_backend
+
+SHIPPING_TOTAL = Decimal("0.00")
+CENT = Decimal("0.01")
+
+
+def discount_for(subtotal: Decimal, coupon) -> Decimal:
+    if not coupon:
+        return Decimal("0.00")
+    if coupon.type == Coupon.Type.PERCENT:
+        return (subtotal * coupon.value / Decimal("100")).quantize(CENT)
+    return min(coupon.value, subtotal).quantize(CENT)
+
+
+class Pricing:
+    """Итоги корзины; items — позиции, по которым они посчитаны."""
+
+    def __init__(self, items, subtotal: Decimal, qty_total: int, coupon=None, shipping_total: Decimal = SHIPPING_TOTAL):
+        self.items = items
+        self.subtotal = subtotal
+        self.qty_total = qty_total
+        self.coupon = coupon
+        self.discount_total = discount_for(subtotal, coupon)
+        self.shipping_total = shipping_total
+        self.total = max((subtotal - self.discount_total + shipping_total).quantize(CENT), Decimal("0.00"))
+
+    @classmethod
+    def from_items(cls, items) -> "Pricing":
+        subtotal, qty_total = Decimal("0.00"), 0
+        for it in items:
+            subtotal += (it.unit_price_snapshot or Decimal("0")) * it.qty
+            qty_total += it.qty
+        return cls(items, subtotal, qty_total)
+
+    def with_coupon(self, coupon) -> "Pricing":
+        """Те же позиции со скидкой по купону — без повторного прохода."""
+        return Pricing(self.items, self.subtotal, self.qty_total, coupon, self.shipping_total)
+
+    def as_context(self) -> dict:
+        return {
+            "items": self.items,
+            "subtotal": self.subtotal,
+            "discount_total": self.discount_total,
+            "shipping_total": self.shipping_total,
+            "total": self.total,
+            "qty_total": self.qty_total,
+        }
+
+
+def get_pricing(request, coupon=None) -> Pricing:
+    """Итоги корзины запроса (и скидка по coupon), запомненные до следующего изменения корзины."""
+    backend = get_cart_backend(request)
+    version = backend.version()
+    memo = getattr(request, "_cart_pricing", None)
+    if memo is None or memo[0] != version:
+        memo = request._cart_pricing = (version, {None: Pricing.from_items(backend.items())})
+    priced = memo[1]
+    key = coupon.pk if coupon is not None else None
+    if key not in priced:
+        priced[key] = priced[None].with_coupon(coupon)
+    return priced[key]
+
+
+def header_totals(request) -> tuple:
+    """
+    (число товаров, подытог) для шапки. Если корзина уже посчитана в этом
+    запросе — из расчёта; иначе из денормализованных итогов без загрузки позиций.
+    """
+    backend = get_cart_backend(request)
+    memo = getattr(request, "_cart_pricing", None)
+    if memo is not None and memo[0] == backend.version():
+        base = memo[1][None]
+        return base.qty_total, base.subtotal
+    return backend.totals()
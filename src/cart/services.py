@@ -1,5 +1,8 @@
 # cart/services.py
 from decimal import Decimal
+from django.db import connection, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.utils import timezone
 from django.utils.crypto import get_random_string
 from .models import Cart, CartItem
 
@@ -34,16 +37,135 @@ def _get_or_create_cart_for_request(request) -> Cart:
 
 def get_cart(request):
     """
-    Возвращает (cart, items_list, subtotal).
+    Возвращает (backend, items_list, subtotal) — см. cart.backends и cart.pricing.
     """
-    cart = _get_or_create_cart_for_request(request)
-    items_qs = CartItem.objects.select_related("product").filter(cart=cart).order_by("id")
+    from .backends import get_cart_backend
+    from .pricing import get_pricing
+    pricing = get_pricing(request)
+    return get_cart_backend(request), pricing.items, pricing.subtotal
 
-    subtotal = Decimal("0")
-    items = []
-    for it in items_qs:
-        line = (it.unit_price_snapshot or Decimal("0")) * it.qty
-        subtotal += line
-        items.append(it)
 
-    return cart, items, subtotal
+def refresh_cart_totals(cart) -> Cart:
+    """
+    Пересчитывает денормализованные items_count/subtotal корзины одним
+    агрегатом и сохраняет их. Вызывается после любого изменения позиций.
+    """
+    totals = CartItem.objects.filter(cart=cart).aggregate(
+        count=Sum("qty"),
+        subtotal=Sum(ExpressionWrapper(
+            F("qty") * F("unit_price_snapshot"), output_field=DecimalField(max_digits=12, decimal_places=2),
+        )),
+    )
+    cart.items_count = totals["count"] or 0
+    cart.subtotal = totals["subtotal"] or Decimal("0.00")
+    Cart.objects.filter(pk=cart.pk).update(
+        items_count=cart.items_count, subtotal=cart.subtotal, version=F("version") + 1, updated_at=timezone.now(),
+    )
+    cart.version += 1
+    return cart
+
+
+def clear_cart(cart) -> Cart:
+    """Удаляет все позиции и обнуляет итоги без пересчёта (DELETE + UPDATE)."""
+    CartItem.objects.filter(cart=cart).delete()
+    cart.items_count = 0
+    cart.subtotal = Decimal("0.00")
+    Cart.objects.filter(pk=cart.pk).update(
+        items_count=0, subtotal=cart.subtotal, version=F("version") + 1, updated_at=timezone.now(),
+    )
+    cart.version += 1
+    return cart
+
+
+def _upsert_items(select_sql: str, params) -> None:
+    """
+    INSERT позиций (VALUES или SELECT) с суммированием qty при конфликте
+    (cart, product) — одним запросом (PostgreSQL и SQLite 3.24+).
+    """
+    table = connection.ops.quote_name(CartItem._meta.db_table)
+    sql = (
+        f"INSERT INTO {table} (created_at, updated_at, cart_id, product_id, qty, unit_price_snapshot) "
+        f"{select_sql} "
+        f"ON CONFLICT (cart_id, product_id) DO UPDATE SET "
+        f"qty = {table}.qty + excluded.qty, updated_at = excluded.updated_at"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def merge_lines(cart, lines) -> None:
+    """
+    Добавляет позиции (product_id, qty, цена) в корзину одним upsert:
+    одинаковые товары складываются. Итоги пересчитывает вызывающий.
+    """
+    from catalog.models import Product
+    wanted = {}
+    for product_id, qty, price in lines:
+        if product_id in wanted:
+            wanted[product_id][0] += qty
+        else:
+            wanted[product_id] = [qty, price]
+    # товар могли удалить, пока он лежал в гостевой корзине
+    alive = sorted(Product.objects.filter(pk__in=wanted).values_list("pk", flat=True))
+    if not alive:
+        return
+    now = timezone.now()
+    params = []
+    for product_id in alive:
+        qty, price = wanted[product_id]
+        params += [now, now, cart.pk, product_id, qty, price]
+    _upsert_items("VALUES " + ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(alive)), params)
+
+
+def merge_carts(source, target) -> None:
+    """
+    Переносит позиции корзины source в target одним INSERT ... SELECT
+    с суммированием qty и удаляет source. Итоги target пересчитывает вызывающий.
+    """
+    now = timezone.now()
+    table = connection.ops.quote_name(CartItem._meta.db_table)
+    _upsert_items(
+        f"SELECT %s, %s, %s, product_id, qty, unit_price_snapshot FROM {table} WHERE cart_id = %s",
+        [now, now, target.pk, source.pk],
+    )
+    source.delete()
+
+
+def merge_guest_cart(request, user) -> None:
+    """
+    При логине сливает гостевую корзину из БД (по токену в сессии) в корзину
+    пользователя. Вызывается при логине из cart.backends.flush_guest_cart.
+    """
+    session_key = request.session.get(SESSION_CART_KEY)
+    if not session_key:
+        return
+    guest_cart = Cart.objects.filter(user__isnull=True, session_key=session_key).first()
+    if guest_cart is not None:
+        cart, _created = Cart.objects.get_or_create(user=user, defaults={})
+        with transaction.atomic():
+            merge_carts(guest_cart, cart)
+            refresh_cart_totals(cart)
+    request.session.pop(SESSION_CART_KEY, None)
+
+
+class CartSummary:
+    """
+    Итоги корзины для шапки. Только чтение: не создаёт ни корзину, ни сессию;
+    итоги берутся из cart.pricing при первом обращении.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self._totals = None
+
+    def _get(self):
+        if self._totals is None:
+            from .pricing import header_totals
+            self._totals = header_totals(self.request)
+        return self._totals
+
+    def count(self) -> int:
+        return self._get()[0]
+
+    def total(self) -> Decimal:
+        return self._get()[1]
@@ -0,0 +1,11 @@
+# cart/signals.py
+from django.contrib.auth.signals import user_logged_in
+from django.dispatch import receiver
+
+from .backends import flush_guest_cart
+
+
+@receiver(user_logged_in)
+def flush_guest_cart_on_login(sender, request, user, **kwargs):
+    if request is not None:
+        flush_guest_cart(request, user)
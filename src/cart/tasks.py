@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from .maintenance import purge_guest_data
+
+
+@shared_task
+def purge_expired_guest_data():
+    """Задача для Celery Beat: удаляет брошенные гостевые корзины, избранное и сессии"""
+    return purge_guest_data()
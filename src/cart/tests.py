@@ -1,3 +1,77 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model, login
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.test import RequestFactory
+
+from cart.backends import CacheCartBackend
+from cart.models import Cart, CartItem
+from cart.services import SESSION_CART_KEY, merge_carts, refresh_cart_totals
+from orders.tests import OrderFlowTestCase
+
+
+class MergeTests(OrderFlowTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user = get_user_model().objects.create_user("buyer", "buyer@example.com", "secret")
+        self.cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=self.cart, product=self.products[0], qty=1, unit_price_snapshot=Decimal("500"))
+        refresh_cart_totals(self.cart)
+
+    def guest_request(self, token="guest-token"):
+        request = RequestFactory().get("/")
+        request.session = SessionStore()
+        request.session[SESSION_CART_KEY] = token
+        return request
+
+    def lines(self):
+        return dict(CartItem.objects.filter(cart=self.cart).values_list("product_id", "qty"))
+
+    def assert_totals(self, count, subtotal, version):
+        cart = Cart.objects.get(pk=self.cart.pk)
+        self.assertEqual((cart.items_count, cart.subtotal, cart.version), (count, Decimal(subtotal), version))
+
+    def test_cache_guest_cart_is_summed_into_user_cart_on_login(self):
+        request = self.guest_request()
+        key = CacheCartBackend.cache_key("guest-token")
+        first, second = self.products
+        cache.set(key, {"v": 3, "lines": {str(first.pk): [2, "500"], str(second.pk): [1, "450"]}})
+        login(request, self.user)
+        self.assertEqual(self.lines(), {first.pk: 3, second.pk: 1})
+        self.assert_totals(4, "1950.00", 2)
+        self.assertIsNone(cache.get(key))
+        self.assertNotIn(SESSION_CART_KEY, request.session)
+
+    def test_cache_guest_cart_skips_deleted_products(self):
+        request = self.guest_request()
+        gone = self.products[1]
+        cache.set(CacheCartBackend.cache_key("guest-token"), {"v": 1, "lines": {
+            str(self.products[0].pk): [1, "500"], str(gone.pk): [1, "500"],
+        }})
+        gone.delete()
+        login(request, self.user)
+        self.assertEqual(self.lines(), {self.products[0].pk: 2})
+        self.assert_totals(2, "1000.00", 2)
+
+    def test_database_guest_cart_is_merged_and_removed(self):
+        guest = Cart.objects.create(session_key="guest-token")
+        for product, qty in zip(self.products, (1, 1)):
+            CartItem.objects.create(cart=guest, product=product, qty=qty, unit_price_snapshot=Decimal("500"))
+        request = self.guest_request()
+        login(request, self.user)
+        self.assertEqual(self.lines(), {self.products[0].pk: 2, self.products[1].pk: 1})
+        self.assert_totals(3, "1500.00", 2)
+        self.assertFalse(Cart.objects.filter(pk=guest.pk).exists())
+
+    def test_merge_carts_keeps_target_price_on_conflict(self):
+        guest = Cart.objects.create(session_key="guest-token")
+        CartItem.objects.create(cart=guest, product=self.products[0], qty=2, unit_price_snapshot=Decimal("400"))
+        merge_carts(guest, self.cart)
+        item = CartItem.objects.get(cart=self.cart)
+        self.assertEqual((item.qty, item.unit_price_snapshot), (3, Decimal("500")))
+        # итоги пересчитывает вызывающий
+        self.assert_totals(1, "500.00", 1)
+        refresh_cart_totals(self.cart)
+        self.assert_totals(3, "1500.00", 2)
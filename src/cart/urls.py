@@ -11,6 +11,7 @@ urlpatterns = [
     # path("update-item/", views.update_item, name="update_item"),
     # path("summary-fragment/", views.cart_summary_fragment, name="summary_fragment"),
     # path("count-fragment/", views.cart_count_fragment, name="count_fragment"),
+    path("update/", views.update_items, name="update_batch"),
     path("update/<int:item_id>/", views.update_item_qty, name="update"),
     path("remove/<int:item_id>/", views.remove_item, name="remove"),
 
@@ -3,23 +3,21 @@ from django.shortcuts import redirect, render, get_object_or_404
 from django.utils.translation import gettext
 from django.views.decorators.http import require_POST
 from django.contrib import messages
-from django.http import HttpResponseRedirect, HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.http import Http404, HttpResponseRedirect, HttpResponse, HttpResponseBadRequest, JsonResponse
 from catalog.models import Product
-from .models import CartItem
-from .utils import get_or_create_cart
+from .backends import get_cart_backend
 from decimal import Decimal
 from django.views.decorators.http import require_POST
 from django.urls import reverse
 from django.template import engines
 from django.template.loader import render_to_string
 from django.contrib.auth.decorators import login_required
-from .services import get_cart, _get_or_create_cart_for_request
+from catalog.translations import prefetch_translations
+from .pricing import get_pricing, header_totals
+from .services import get_cart
 
 def cart_detail(request):
-    cart = get_or_create_cart(request)
-    items = cart.items.select_related("product").all()
-    subtotal = sum((i.unit_price_snapshot * i.qty for i in items), Decimal("0.00"))
-    ctx = {"cart": cart, "items": items, "subtotal": subtotal}
+    ctx = get_pricing(request).as_context()
     return render(request, "cart/cart_detail.html", ctx)
 
 def _render_badge_oob(total_qty: int) -> str:
@@ -28,21 +26,15 @@ def _render_badge_oob(total_qty: int) -> str:
 
 @require_POST
 def cart_add(request):
-    cart = get_or_create_cart(request)
+    cart = get_cart_backend(request)
     pid = int(request.POST.get("product_id", "0"))
     product = get_object_or_404(Product, pk=pid, is_published=True)
     qty = int(request.POST.get("qty", "1"))
 
-    item, created = cart.items.get_or_create(
-        product=product,
-        defaults={"qty": qty, "unit_price_snapshot": product.price}
-    )
-    if not created:
-        item.qty += qty
-        item.save(update_fields=["qty", "updated_at"])
+    cart.add(product, qty)
 
-    # Получаем общее количество товаров в корзине
-    total_qty = sum(i.qty for i in cart.items.all())
+    # Общее количество товаров в корзине — из пересчитанных итогов
+    total_qty, _subtotal = header_totals(request)
 
     if request.headers.get("HX-Request") == "true":
         # Создаем HTML для значка корзины
@@ -61,15 +53,13 @@ def cart_add(request):
 
 @require_POST
 def cart_update(request, item_id):
-    cart = get_or_create_cart(request)
-    item = get_object_or_404(CartItem, pk=item_id, cart=cart)
+    cart = get_cart_backend(request)
     qty = int(request.POST.get("qty", "1"))
+    if cart.set_qty(item_id, qty) is None:
+        raise Http404("Item not found")
     if qty <= 0:
-        item.delete()
         messages.info(request, "Тhe product has been removed from the shopping cart.")
     else:
-        item.qty = qty
-        item.save(update_fields=["qty", "updated_at"])
         messages.success(request, "The quantity has been updated.")
     if request.headers.get("HX-Request") == "true":
         resp = redirect("cart:detail")
@@ -79,9 +69,8 @@ def cart_update(request, item_id):
 
 @require_POST
 def cart_remove(request, item_id):
-    cart = get_or_create_cart(request)
-    item = get_object_or_404(CartItem, pk=item_id, cart=cart)
-    item.delete()
+    if not get_cart_backend(request).remove(item_id):
+        raise Http404("Item not found")
     messages.info(request, "The product has been deleted.")
     if request.headers.get("HX-Request") == "true":
         resp = redirect("cart:detail")
@@ -96,32 +85,19 @@ from django.views.decorators.http import require_POST
 from django.http import HttpResponse, HttpResponseBadRequest
 from django.template.loader import render_to_string
 
-def _recalc(cart):
-    items = list(cart.items.select_related("product"))
-    subtotal = sum((x.unit_price_snapshot * x.qty for x in items), Decimal("0.00"))
-    shipping_total = Decimal("0.00")
-    total = (subtotal + shipping_total).quantize(Decimal("0.01"))
-    qty_total = sum((x.qty for x in items), 0)
-    return items, subtotal, shipping_total, total, qty_total
-
 def cart_summary_fragment(request):
-    cart = get_or_create_cart(request)
-    _, subtotal, shipping_total, total, _ = _recalc(cart)
-    html = render_to_string("cart/_summary.html", {
-        "subtotal": subtotal, "shipping_total": shipping_total, "total": total
-    }, request=request)
+    html = render_to_string("cart/_summary.html", get_pricing(request).as_context(), request=request)
     return HttpResponse(html)
 
 def cart_count_fragment(request):
-    cart = get_or_create_cart(request)
-    *_, qty_total = _recalc(cart)
+    qty_total, _subtotal = header_totals(request)
     html = render_to_string("cart/_cart_count.html", {"qty": qty_total}, request=request)
     return HttpResponse(html)
 
 
 @require_POST
 def update_item(request):
-    cart = get_or_create_cart(request)
+    cart = get_cart_backend(request)
     try:
         item_id = int(request.POST.get("item_id", "0"))
         qty_str = request.POST.get("qty")
@@ -130,21 +106,20 @@ def update_item(request):
     except (ValueError, TypeError):
         return HttpResponseBadRequest("Bad request")
 
-    item = get_object_or_404(CartItem, id=item_id, cart=cart)
+    item = cart.get_item(item_id)
+    if item is None:
+        raise Http404("Item not found")
 
     if item.product.in_stock < qty:
         qty = item.product.in_stock
         if qty < 1:
-            item.delete()
+            cart.remove(item_id)
             response = HttpResponse(status=204);
             response['HX-Redirect'] = request.path_info;
             return response
 
-    item.qty = qty
-    item.save(update_fields=["qty"])
-
-    # Вызываем вашу существующую функцию _recalc
-    _, subtotal, _, _, qty_total = _recalc(cart)
+    item = cart.set_qty(item_id, qty)
+    qty_total, subtotal = header_totals(request)
 
     # Рендерим все 4 фрагмента, которые нужно обновить
     row_html = render_to_string("cart/_row.html", {"it": item}, request=request)
@@ -158,6 +133,41 @@ def update_item(request):
 
 
 
+@require_POST
+def update_items(request):
+    """
+    Пакетное изменение количеств: item_id и qty повторяются парами.
+    Всё применяется одной транзакцией, ответ — один HTMX-ответ с OOB-фрагментами
+    изменённых строк и карточек, итогов и значка корзины.
+    """
+    try:
+        changes = {
+            int(item_id): int(qty)
+            for item_id, qty in zip(request.POST.getlist("item_id"), request.POST.getlist("qty"))
+        }
+    except (TypeError, ValueError):
+        return HttpResponseBadRequest("Bad request")
+    if not changes:
+        return HttpResponseBadRequest("Bad request")
+
+    cart = get_cart_backend(request)
+    updated, removed = cart.update_many(changes)
+    prefetch_translations(it.product for it in updated)
+    qty_total, subtotal = header_totals(request)
+
+    html = render_to_string("cart/_batch_update.html", {
+        "updated": updated,
+        "removed": removed,
+        "subtotal": subtotal,
+        "qty_total": qty_total,
+    }, request=request)
+    response = HttpResponse(html)
+    if not qty_total:
+        # корзина опустела — перерисуем страницу с пустым состоянием
+        response["HX-Refresh"] = "true"
+    return response
+
+
 def _render_money_html(amount, currency):
     tpl = engines["django"].from_string(
         "{% load cart_extras %}{{ amount|money }} {{ currency }}"
@@ -169,18 +179,10 @@ def _render_badge_html(total_qty: int) -> str:
 
 @require_POST
 def update_item_qty(request, item_id):
-    print("this is update_item_qty") # Ваш отладочный принт
-
     # 1. Получаем корзину для ЛЮБОГО пользователя (гостя или залогиненного)
-    cart = get_or_create_cart(request)
-
-    try:
-        # 2. Ищем товар строго внутри этой корзины. Это безопасно и правильно.
-        item = cart.items.get(pk=item_id)
-    except CartItem.DoesNotExist:
-        return JsonResponse({"ok": False, "error": "Item not found in your cart"}, status=404)
+    cart = get_cart_backend(request)
 
-    # 3. Получаем новое количество из POST-запроса
+    # 2. Получаем новое количество из POST-запроса
     try:
         # Ваш JS-код отправляет данные в формате x-www-form-urlencoded
         qty = int(request.POST.get('qty', '1'))
@@ -190,14 +192,14 @@ def update_item_qty(request, item_id):
     except (ValueError, TypeError):
         return JsonResponse({"ok": False, "error": "Invalid quantity provided"}, status=400)
 
-    # 4. Обновляем и сохраняем
-    item.qty = qty
-    item.save(update_fields=['qty', 'updated_at'])
+    # 3. Обновляем строго внутри этой корзины: чужой или несуществующий товар — 404
+    item = cart.set_qty(item_id, qty)
+    if item is None:
+        return JsonResponse({"ok": False, "error": "Item not found in your cart"}, status=404)
 
-    # 5. Готовим JSON-ответ с HTML-фрагментами для обновления страницы
-    items = cart.items.all()
-    subtotal = sum(i.qty * i.unit_price_snapshot for i in items)
-    total_qty = sum(i.qty for i in items)
+    # 4. Готовим JSON-ответ с HTML-фрагментами для обновления страницы
+    pricing = get_pricing(request)
+    items, subtotal, total_qty = pricing.items, pricing.subtotal, pricing.qty_total
 
     # Форматируем цену для строки товара.
     # Если у вас есть templatetag 'money', используйте его в шаблоне
@@ -223,19 +225,15 @@ def update_item_qty(request, item_id):
 
 @require_POST
 def remove_item(request, item_id: int):
-    cart = _get_or_create_cart_for_request(request)
+    cart = get_cart_backend(request)
 
-    try:
-        item = CartItem.objects.select_related("product").get(id=item_id, cart=cart)
-    except CartItem.DoesNotExist:
+    if not cart.remove(item_id):
         if request.headers.get("x-requested-with") == "XMLHttpRequest":
             return JsonResponse({"ok": False, "error": "Item not found"}, status=400)
         return HttpResponseBadRequest("Item not found")
 
-    item.delete()
-
-    cart_obj, items, subtotal = get_cart(request)
-    total_qty = sum(i.qty for i in items)
+    pricing = get_pricing(request)
+    items, subtotal, total_qty = pricing.items, pricing.subtotal, pricing.qty_total
 
     if request.headers.get("x-requested-with") == "XMLHttpRequest":
         summary_html = render_to_string("cart/_summary.html", {"subtotal": subtotal}, request=request)
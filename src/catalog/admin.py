@@ -1,12 +1,34 @@
 from django import forms
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
 from django.forms.models import BaseInlineFormSet
 from parler.admin import TranslatableAdmin
 from .models import Category, Brand, Product, ProductImage
+from .translations import prefetch_translations
+
+
+class TranslationPrefetchChangeList(ChangeList):
+    """Переводы строк страницы списка — одним запросом, а не по объекту и языку."""
+
+    def get_results(self, request):
+        super().get_results(request)
+        prefetch_translations(self.result_list)
+        related = getattr(self.model_admin, "prefetch_translations_for", ())
+        for name in related:
+            prefetch_translations({getattr(obj, name) for obj in self.result_list} - {None})
+
+
+class TranslationPrefetchMixin:
+    prefetch_translations_for = ()
+
+    def get_changelist(self, request, **kwargs):
+        return TranslationPrefetchChangeList
 
 @admin.register(Category)
-class CategoryAdmin(TranslatableAdmin):
+class CategoryAdmin(TranslationPrefetchMixin, TranslatableAdmin):
     list_display = ("slug", "translated_name", "parent")
+    list_select_related = ("parent",)
+    prefetch_translations_for = ("parent",)
     search_fields = ("translations__name", "slug")
     list_filter = ("parent",)
     def translated_name(self, obj):
@@ -45,8 +67,9 @@ class ProductImageInline(admin.TabularInline):
     formset = ProductImageInlineFormSet
 
 @admin.register(Product)
-class ProductAdmin(TranslatableAdmin):
+class ProductAdmin(TranslationPrefetchMixin, TranslatableAdmin):
     list_display = ("title_any", "brand", "model_name", "storage_gb", "color", "condition", "price", "in_stock", "is_published")
+    list_select_related = ("brand",)
     list_filter = ("brand", "category", "condition", "storage_gb", "color", "is_published")
     search_fields = ("translations__title", "model_name", "sku", "base_slug")
     inlines = [ProductImageInline]
@@ -0,0 +1,167 @@
+# catalog/api.py
+"""
+Публичное read-only API каталога: /api/v1/products/, /categories/, /brands/.
+
+Товары фильтруются теми же функциями, что и product_list (catalog.filters),
+и листаются той же keyset-пагинацией (catalog.pagination): курсор в ответе
+— готовая ссылка next. ?fields= сокращает ответ до нужных полей.
+
+Каждый ответ несёт ETag (catalog.conditional); клиент, опрашивающий каталог
+с If-None-Match, получает 304 до выборки и сериализации — стоимость одного
+запроса MAX(updated_at). Last-Modified не отдаём: общий MAX(updated_at)
+товаров не отражает изменения брендов и категорий и удалённые товары, и
+If-Modified-Since по нему давал бы устаревшие 304.
+"""
+import django_filters
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from rest_framework import viewsets
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.routers import DefaultRouter
+from rest_framework.utils.urls import replace_query_param
+
+from .conditional import catalog_etag, catalog_last_modified
+from .filters import ORDERINGS, filter_products, order_products, parse_product_filters, search_products
+from .models import Brand, Category, Product
+from .pagination import keyset_page
+from .serializers import BrandSerializer, CategorySerializer, ProductDetailSerializer, ProductSerializer
+from .services import with_card_data
+from .translations import prefetch_translations
+
+API_PAGE_SIZE = 24
+API_MAX_PAGE_SIZE = 100
+
+
+class ProductFilterSet(django_filters.FilterSet):
+    """Параметры product_list (brand, storage, cond, price_min/max, q, o) плюс category."""
+
+    brand = django_filters.CharFilter()
+    storage = django_filters.CharFilter()
+    cond = django_filters.CharFilter()
+    price_min = django_filters.CharFilter()
+    price_max = django_filters.CharFilter()
+    q = django_filters.CharFilter()
+    o = django_filters.CharFilter()
+    category = django_filters.CharFilter(field_name="category__slug")
+
+    class Meta:
+        model = Product
+        fields = []
+
+    def filter_queryset(self, queryset):
+        current = parse_product_filters(self.data)
+        if self.data.get("category"):
+            queryset = queryset.filter(category__slug=self.data["category"])
+        queryset = filter_products(queryset, current)
+        queryset, ranked_ids = search_products(queryset, current["q"])
+        return order_products(queryset, current["o"], ranked_ids)
+
+
+class ProductCursorPagination(BasePagination):
+    """Обёртка над catalog.pagination.keyset_page: ?cursor=, ?limit= (до API_MAX_PAGE_SIZE)."""
+
+    def paginate_queryset(self, queryset, request, view=None):
+        current = parse_product_filters(request.query_params)
+        limit = request.query_params.get("limit", "")
+        per_page = min(int(limit), API_MAX_PAGE_SIZE) if limit.isdigit() and int(limit) > 0 else API_PAGE_SIZE
+        # с поиском без явной сортировки порядок задаёт релевантность — курсор там смещение
+        ranked = bool(current["q"]) and current["o"] not in ORDERINGS
+        self.request = request
+        self.page = keyset_page(queryset, current["o"], request.query_params.get("cursor", ""),
+                                per_page=per_page, ranked=ranked)
+        return self.page.object_list
+
+    def get_next_link(self):
+        if not self.page.has_next:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), "cursor", self.page.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {"next": {"type": "string", "nullable": True, "format": "uri"}, "results": schema},
+        }
+
+
+class SlugCursorPagination(CursorPagination):
+    page_size = 100
+    ordering = "slug"
+
+
+class NameCursorPagination(SlugCursorPagination):
+    ordering = "name"
+
+
+class ConditionalGetMixin:
+    """ETag для list и retrieve; совпавший If-None-Match — 304 без выборки."""
+
+    def _conditional(self, request, handler, *args, **kwargs):
+        last_modified = catalog_last_modified()
+        etag = catalog_etag(
+            last_modified.timestamp() if last_modified else 0,
+            request.accepted_renderer.format, request.get_full_path(),
+        )
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response["ETag"] = etag
+            # Cookie: браузерный рендерер DRF показывает вошедшего пользователя
+            patch_vary_headers(response, ("Accept", "Accept-Language", "Cookie"))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(request, super().retrieve, *args, **kwargs)
+
+
+class ProductViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    permission_classes = [AllowAny]
+    filterset_class = ProductFilterSet
+    pagination_class = ProductCursorPagination
+    lookup_field = "base_slug"
+
+    def get_queryset(self):
+        qs = with_card_data(Product.objects.filter(is_published=True)).select_related("category")
+        if self.action == "list":
+            # как в product_list: только то, что можно купить
+            return qs.filter(in_stock__gt=0)
+        return qs.prefetch_related("images")
+
+    def get_serializer_class(self):
+        return ProductDetailSerializer if self.action == "retrieve" else ProductSerializer
+
+    def get_object(self):
+        product = super().get_object()
+        # описание на активном языке + fallback одним запросом
+        prefetch_translations([product])
+        return product
+
+
+class CategoryViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    permission_classes = [AllowAny]
+    queryset = Category.objects.prefetch_related("translations")
+    serializer_class = CategorySerializer
+    pagination_class = SlugCursorPagination
+    filterset_fields = ("parent",)
+    lookup_field = "slug"
+
+
+class BrandViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    permission_classes = [AllowAny]
+    queryset = Brand.objects.all()
+    serializer_class = BrandSerializer
+    pagination_class = NameCursorPagination
+    lookup_field = "slug"
+
+
+router = DefaultRouter()
+router.register("products", ProductViewSet, basename="product")
+router.register("categories", CategoryViewSet, basename="category")
+router.register("brands", BrandViewSet, basename="brand")
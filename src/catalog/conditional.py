@@ -0,0 +1,124 @@
+# catalog/conditional.py
+"""
+Валидаторы условных GET для каталога.
+
+Last-Modified — максимальный updated_at товаров (индекс по updated_at, один
+запрос; его двигают и сохранения, и UPDATE остатков). ETag добавляет к нему
+версию каталога — её поднимают сигналы при правке переводов, фото, брендов
+и категорий, которые updated_at товара не трогают, — язык и вариант ответа.
+
+conditional_page — то же для HTML-страниц (каталог, CMS). ETag — Last-Modified,
+версия каталога (строка в БД, общая для всех воркеров), релиз и путь.
+Совпал If-None-Match — 304 до вызова view; Cache-Control у 200 и 304 один.
+
+Анонимный посетитель без сессии (из cookie — не больше CSRF и языка) видит
+одну и ту же страницу: она рендерится с заглушкой вместо CSRF-токена
+(request.shared_page, см. catalog.context_processors.shared_page), токен
+подставляет скрипт из base.html запросом к csrf_token_view. Такой ответ —
+public, max-age=0, s-maxage=PAGE_CACHE_S_MAXAGE: CDN отдаёт его без похода
+в приложение, браузер каждый раз сверяет ETag. Остальным — private,
+no-cache, а в ETag входят вход, корзина, избранное и CSRF-секрет; секрет
+берётся после get_token(), так что первый визит без CSRF-cookie не
+стоит лишнего 200.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.contrib.messages.storage.session import SessionStorage
+from django.db.models import Max
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.translation import get_language
+
+from .favorites import get_store
+from .fragments import get_catalog_version
+from .models import Product
+
+PAGE_VARY = ("Cookie", "Accept-Language", "HX-Request")
+
+
+def catalog_last_modified():
+    """Время последнего изменения товаров (aware datetime) или None для пустого каталога."""
+    return Product.objects.order_by().aggregate(last=Max("updated_at"))["last"]
+
+
+def catalog_etag(last_modified, *parts) -> str:
+    """ETag из версии каталога, языка, last_modified и дополнительных parts (путь, формат…)."""
+    raw = ":".join(str(p) for p in (get_catalog_version(), get_language(), last_modified, *parts))
+    return '"%s"' % hashlib.md5(raw.encode()).hexdigest()
+
+
+def _has_pending_messages(request) -> bool:
+    # страница с сообщением должна отрисоваться, иначе оно не будет показано и снято
+    if request.COOKIES.get(CookieStorage.cookie_name):
+        return True
+    session = getattr(request, "session", None)
+    return bool(session is not None and session.get(SessionStorage.session_key))
+
+
+def _is_shared(request) -> bool:
+    """Аноним без сессии: персонального в странице нет, кроме CSRF-токена."""
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return False
+    return set(request.COOKIES) <= {settings.CSRF_COOKIE_NAME, settings.LANGUAGE_COOKIE_NAME}
+
+
+def _visitor_parts(request) -> tuple:
+    """Всё персональное в странице: вход, корзина и избранное в шапке, CSRF-секрет (токен в формах)."""
+    from cart.services import CartSummary
+
+    user = getattr(request, "user", None)
+    auth = f"u{user.pk}" if user is not None and user.is_authenticated else "anon"
+    cart = CartSummary(request)
+    favorites = ",".join(str(pk) for pk in sorted(get_store(request).ids()))
+    # секрет, который получит cookie этого ответа, — и при первом визите без неё
+    get_token(request)
+    return auth, cart.count(), cart.total(), favorites, request.META.get("CSRF_COOKIE", "")
+
+
+def _sets_cookies(request, response) -> bool:
+    # CSRF- и session-cookie ставят middleware уже после view — смотрим флаги
+    session = getattr(request, "session", None)
+    return bool(
+        response.cookies
+        or request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+        or (session is not None and session.modified)
+    )
+
+
+def conditional_page(view):
+    """Декоратор HTML-view: ETag, 304 по If-None-Match до рендера, Cache-Control и Vary."""
+
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD") or _has_pending_messages(request):
+            return view(request, *args, **kwargs)
+
+        shared = request.shared_page = _is_shared(request)
+        last_modified = catalog_last_modified()
+        etag = catalog_etag(
+            last_modified.timestamp() if last_modified else 0,
+            getattr(settings, "RELEASE_ID", ""), request.get_full_path(),
+            request.headers.get("HX-Request", ""), *(("shared",) if shared else _visitor_parts(request)),
+        )
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = view(request, *args, **kwargs)
+        if response.status_code not in (200, 304):
+            return response
+
+        response["ETag"] = etag
+        if shared and not _sets_cookies(request, response):
+            patch_cache_control(
+                response, public=True, max_age=0,
+                s_maxage=getattr(settings, "PAGE_CACHE_S_MAXAGE", 60),
+            )
+        else:
+            patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, PAGE_VARY)
+        return response
+
+    return wrapped
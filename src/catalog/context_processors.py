@@ -1,15 +1,18 @@
-from .models import Favorite
+from .favorites import get_store
+from .fragments import CSRF_PLACEHOLDER
 
-def favorites_info(request):
-    if request.user.is_authenticated:
-        count = Favorite.objects.filter(user=request.user).count()
-        fav_ids = list(Favorite.objects.filter(user=request.user).values_list('product_id', flat=True))
-    else:
-        s_key = request.session.session_key
-        count = Favorite.objects.filter(session_key=s_key).count() if s_key else 0
-        fav_ids = list(Favorite.objects.filter(session_key=s_key).values_list('product_id', flat=True)) if s_key else []
 
+def favorites_info(request):
+    # Callables: шаблон вызывает их только при обращении, набор грузится один раз на запрос
+    store = get_store(request)
     return {
-        'fav_count': count,
-        'fav_ids': fav_ids
-    }
\ No newline at end of file
+        'fav_count': store.count,
+        'fav_ids': store.ids,
+    }
+
+
+def shared_page(request):
+    # Общая страница (catalog.conditional): заглушка вместо CSRF-токена, без get_token и cookie
+    if not getattr(request, "shared_page", False):
+        return {}
+    return {"shared_page": True, "csrf_token": CSRF_PLACEHOLDER, "csrf_placeholder": CSRF_PLACEHOLDER}
@@ -0,0 +1,182 @@
+# catalog/facets.py
+"""
+Фасетный индекс каталога.
+
+Компактная копия опубликованных товаров в наличии (бренд, категория, память,
+состояние, цена) хранится в кэше под ключом с версией каталога
+(catalog.fragments). Счётчики для любой комбинации фильтров считаются за один
+проход по индексу, без COUNT-запросов в БД.
+
+Индекс не правится на месте: любое изменение, влияющее на фасеты (сохранение
+или удаление товара и бренда, товар закончился или снова появился), поднимает
+версию, и следующий читатель собирает индекс заново двумя запросами. Так нет
+гонок чтение-изменение-запись и расхождений между процессами.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+
+from .filters import CONDITIONS, _is_number
+from .fragments import get_catalog_version
+from .models import Brand, Product
+
+FACETS_CACHE_KEY = "catalog:facets:{version}"
+# старые версии перестают читаться и просто истекают
+FACETS_CACHE_TIMEOUT = 6 * 3600
+
+# (метка, от, до) — верхняя граница не включается, None = без ограничения
+PRICE_BANDS = [
+    ("0-300", Decimal("0"), Decimal("300")),
+    ("300-600", Decimal("300"), Decimal("600")),
+    ("600-1000", Decimal("600"), Decimal("1000")),
+    ("1000+", Decimal("1000"), None),
+]
+
+FACET_NAMES = ("brand", "category", "storage", "cond", "price")
+
+EMPTY_FACETS = {
+    "total": 0,
+    "brand": [],
+    "category": [],
+    "storage": [],
+    "cond": [],
+    "price": [],
+}
+
+
+def price_band(price) -> str:
+    for label, low, high in PRICE_BANDS:
+        if price >= low and (high is None or price < high):
+            return label
+    return PRICE_BANDS[0][0]
+
+
+def _row(brand_id, category_id, storage_gb, condition, price):
+    return (brand_id, category_id, storage_gb, condition, price, price_band(price))
+
+
+def _visible_products():
+    return Product.objects.filter(is_published=True, in_stock__gt=0)
+
+
+def _cache_key() -> str:
+    return FACETS_CACHE_KEY.format(version=get_catalog_version())
+
+
+def build_index() -> dict:
+    """Строит индекс с нуля: два запроса (товары + бренды)."""
+    key = _cache_key()
+    rows = {
+        pk: _row(*values)
+        for pk, *values in _visible_products().values_list(
+            "id", "brand_id", "category_id", "storage_gb", "condition", "price"
+        ).order_by()
+    }
+    brands = {pk: (slug, name) for pk, slug, name in Brand.objects.values_list("id", "slug", "name")}
+    index = {"rows": rows, "brands": brands}
+    cache.set(key, index, FACETS_CACHE_TIMEOUT)
+    return index
+
+
+def get_index() -> dict:
+    index = cache.get(_cache_key())
+    if index is None:
+        index = build_index()
+    return index
+
+
+def _to_decimal(value: str):
+    if not _is_number(value):
+        return None
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        return None
+
+
+def _predicates(filters: dict, brands: dict, category_id):
+    """
+    Собирает проверки по каждому фасету. Для фасета без активного фильтра
+    проверки нет — строка проходит его автоматически.
+    """
+    checks = {}
+    if filters.get("brand"):
+        slug = filters["brand"]
+        brand_ids = {pk for pk, (b_slug, _name) in brands.items() if b_slug == slug}
+        checks["brand"] = lambda row: row[0] in brand_ids
+    if category_id is not None:
+        checks["category"] = lambda row: row[1] == category_id
+    if filters.get("storage", "").isdigit():
+        storage = int(filters["storage"])
+        checks["storage"] = lambda row: row[2] == storage
+    if filters.get("cond") in CONDITIONS:
+        cond = filters["cond"]
+        checks["cond"] = lambda row: row[3] == cond
+    price_min = _to_decimal(filters.get("price_min", ""))
+    price_max = _to_decimal(filters.get("price_max", ""))
+    if price_min is not None or price_max is not None:
+        checks["price"] = lambda row: (
+            (price_min is None or row[4] >= price_min) and (price_max is None or row[4] <= price_max)
+        )
+    return checks
+
+
+def facet_counts(filters: dict, category=None, restrict_ids=None) -> dict:
+    """
+    Возвращает счётчики по всем фасетам для комбинации фильтров.
+
+    Счётчик значения фасета считается с учётом всех остальных фильтров, но без
+    фильтра самого этого фасета — так в селекте видно, сколько товаров будет
+    после переключения на другое значение. restrict_ids ограничивает выборку
+    (например, результатами поиска).
+    """
+    index = get_index()
+    rows = index["rows"]
+    brands = index["brands"]
+    if restrict_ids is not None:
+        if not restrict_ids:
+            return EMPTY_FACETS
+        rows = {pk: rows[pk] for pk in restrict_ids if pk in rows}
+    if not rows:
+        return EMPTY_FACETS
+
+    checks = _predicates(filters, brands, category.pk if category else None)
+    counters = {name: {} for name in FACET_NAMES}
+    positions = {"brand": 0, "category": 1, "storage": 2, "cond": 3, "price": 5}
+    total = 0
+
+    for row in rows.values():
+        failed = [name for name, check in checks.items() if not check(row)]
+        if len(failed) > 1:
+            continue
+        if failed:
+            # строка отсекается ровно одним фасетом — она считается только в нём
+            name = failed[0]
+            counter = counters[name]
+            key = row[positions[name]]
+            counter[key] = counter.get(key, 0) + 1
+            continue
+        total += 1
+        for name, pos in positions.items():
+            counter = counters[name]
+            counter[row[pos]] = counter.get(row[pos], 0) + 1
+
+    if not total and not any(counters.values()):
+        return EMPTY_FACETS
+
+    brand_facets = [
+        {"id": pk, "slug": brands[pk][0], "name": brands[pk][1], "count": count}
+        for pk, count in counters["brand"].items() if pk in brands
+    ]
+    brand_facets.sort(key=lambda b: b["name"].lower())
+    return {
+        "total": total,
+        "brand": brand_facets,
+        "category": [{"id": pk, "count": count} for pk, count in sorted(counters["category"].items())],
+        "storage": [{"value": gb, "count": count} for gb, count in sorted(counters["storage"].items())],
+        "cond": [{"value": code, "count": count} for code, count in sorted(counters["cond"].items())],
+        "price": [
+            {"label": label, "min": low, "max": high, "count": counters["price"][label]}
+            for label, low, high in PRICE_BANDS if label in counters["price"]
+        ],
+    }
@@ -0,0 +1,273 @@
+# catalog/favorites.py
+"""
+Хранилище избранного.
+
+Набор id избранных товаров посетителя лежит одним ключом в кэше и читается
+лениво — только когда шаблон обращается к fav_ids / fav_count. Владелец —
+пользователь или гость; гость опознаётся токеном в данных сессии (по умолчанию
+это session_key), токен переживает смену ключа сессии при логине.
+
+Переключения сразу меняют набор в кэше, а в таблицу Favorite попадают через
+очередь в Redis, которую пачками разбирает Celery (write-behind). Без общего
+кэша (USE_REDIS=0) запись идёт в БД сразу, а набор в локальном кэше процесса
+не держим — другие воркеры его не увидят и отдадут устаревшим.
+
+Очередь разбирается надёжно: пачка переносится LMOVE в список processing и
+удаляется оттуда только после коммита. Если применение упало, пачка остаётся
+в processing и следующий проход начинает с неё.
+"""
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Favorite, Product
+
+FAVORITES_CACHE_TIMEOUT = 24 * 3600
+FAVORITES_QUEUE_KEY = "catalog:fav:queue"
+FAVORITES_PROCESSING_KEY = "catalog:fav:processing"
+FAVORITES_FLUSH_LOCK_KEY = "catalog:fav:flush-lock"
+FAVORITES_FLUSH_LOCK_TIMEOUT = 5 * 60
+# гость уже перенесён пользователю — его отложенные операции больше не применяем
+FAVORITES_MERGED_KEY = "catalog:fav:merged:{token}"
+FAVORITES_FLUSH_BATCH = 500
+GUEST_TOKEN_SESSION_KEY = "fav_token"
+
+
+def write_behind_enabled() -> bool:
+    return getattr(settings, "FAVORITES_WRITE_BEHIND", getattr(settings, "USE_REDIS", False))
+
+
+def cache_enabled() -> bool:
+    return getattr(settings, "FAVORITES_CACHE", getattr(settings, "USE_REDIS", False))
+
+
+def _redis():
+    from django_redis import get_redis_connection
+    return get_redis_connection("default")
+
+
+def _cache_key(owner) -> str:
+    kind, value = owner
+    return f"catalog:fav:{kind}:{value}"
+
+
+def _owner_filter(owner) -> dict:
+    kind, value = owner
+    return {"user_id": value} if kind == "u" else {"session_key": value}
+
+
+def load_ids(owner) -> set:
+    """Набор из кэша, при промахе (или без общего кэша) — один запрос в БД."""
+    key = _cache_key(owner)
+    ids = cache.get(key) if cache_enabled() else None
+    if ids is None:
+        ids = set(Favorite.objects.filter(**_owner_filter(owner)).values_list("product_id", flat=True))
+        if cache_enabled():
+            cache.set(key, ids, FAVORITES_CACHE_TIMEOUT)
+    return ids
+
+
+def _store_ids(owner, ids) -> None:
+    if cache_enabled():
+        cache.set(_cache_key(owner), ids, FAVORITES_CACHE_TIMEOUT)
+
+
+def _enqueue(op: str, owner, product_id) -> None:
+    _redis().rpush(FAVORITES_QUEUE_KEY, json.dumps([op, owner[0], owner[1], product_id]))
+
+
+def _persist(op: str, owner, product_id) -> None:
+    if write_behind_enabled():
+        _enqueue(op, owner, product_id)
+    elif op == "add":
+        Favorite.objects.bulk_create(
+            [Favorite(product_id=product_id, **_owner_filter(owner))], ignore_conflicts=True
+        )
+    else:
+        Favorite.objects.filter(product_id=product_id, **_owner_filter(owner)).delete()
+
+
+class FavoritesStore:
+    """Избранное текущего посетителя; набор загружается при первом обращении."""
+
+    def __init__(self, request):
+        self.request = request
+        self._ids = None
+
+    @property
+    def owner(self):
+        user = getattr(self.request, "user", None)
+        if user is not None and user.is_authenticated:
+            return "u", user.pk
+        session = getattr(self.request, "session", None)
+        if session is None:
+            return None
+        token = session.get(GUEST_TOKEN_SESSION_KEY) or session.session_key
+        return ("s", token) if token else None
+
+    def ids(self) -> set:
+        if self._ids is None:
+            owner = self.owner
+            self._ids = load_ids(owner) if owner else set()
+            if owner and owner[0] == "s" and self._ids:
+                self._remember_guest_token(owner[1])
+        return self._ids
+
+    def count(self) -> int:
+        return len(self.ids())
+
+    def _remember_guest_token(self, token) -> None:
+        # Токен в данных сессии нужен, чтобы найти гостевое избранное после логина
+        session = self.request.session
+        if session.get(GUEST_TOKEN_SESSION_KEY) != token:
+            session[GUEST_TOKEN_SESSION_KEY] = token
+
+    def toggle(self, product_id) -> bool:
+        """Добавляет или убирает товар; возвращает True, если теперь в избранном."""
+        if self.owner is None:
+            # у гостя ещё нет сессии — создаём, чтобы было к чему привязать избранное
+            self.request.session.create()
+        owner = self.owner
+        ids = set(self.ids())
+        if product_id in ids:
+            ids.discard(product_id)
+            op = "remove"
+        else:
+            ids.add(product_id)
+            op = "add"
+        self._ids = ids
+        _store_ids(owner, ids)
+        if owner[0] == "s":
+            self._remember_guest_token(owner[1])
+        _persist(op, owner, product_id)
+        return op == "add"
+
+
+def get_store(request) -> FavoritesStore:
+    """Один экземпляр на запрос — контекстный процессор и view делят загруженный набор."""
+    store = getattr(request, "_favorites_store", None)
+    if store is None:
+        store = request._favorites_store = FavoritesStore(request)
+    return store
+
+
+def _claim_batch(conn, size: int) -> list:
+    """
+    Пачка для применения: недоразобранный остаток в processing (он старше
+    очереди), иначе до size операций, перенесённых туда из очереди через LMOVE.
+    """
+    items = conn.lrange(FAVORITES_PROCESSING_KEY, 0, -1)
+    if not items:
+        pipe = conn.pipeline()
+        for _ in range(size):
+            pipe.lmove(FAVORITES_QUEUE_KEY, FAVORITES_PROCESSING_KEY, "LEFT", "RIGHT")
+        items = [item for item in pipe.execute() if item is not None]
+    return [json.loads(item) for item in items]
+
+
+def _merged_tokens(tokens) -> set:
+    if not tokens:
+        return set()
+    keys = {FAVORITES_MERGED_KEY.format(token=token): token for token in tokens}
+    return {keys[key] for key in cache.get_many(list(keys))}
+
+
+def apply_operations(operations) -> int:
+    """
+    Применяет пачку операций к таблице: для каждой пары (владелец, товар)
+    берётся последняя операция, затем один bulk_create и один DELETE.
+    Операции удалённых товаров и пользователей, а также уже перенесённых
+    гостей отбрасываются — иначе пачка падала бы на внешнем ключе снова и снова.
+    """
+    latest = {}
+    for op, kind, value, product_id in operations:
+        latest[(kind, value, product_id)] = op
+
+    product_ids = {product_id for _, _, product_id in latest}
+    user_ids = {value for kind, value, _ in latest if kind == "u"}
+    live_products = set(Product.objects.filter(pk__in=product_ids).values_list("pk", flat=True))
+    live_users = set(get_user_model().objects.filter(pk__in=user_ids).values_list("pk", flat=True))
+    merged = _merged_tokens({value for kind, value, _ in latest if kind == "s"})
+    latest = {
+        (kind, value, product_id): op
+        for (kind, value, product_id), op in latest.items()
+        if product_id in live_products
+        and (value in live_users if kind == "u" else value not in merged)
+    }
+
+    adds = []
+    removals = Q()
+    for (kind, value, product_id), op in latest.items():
+        owner_fields = _owner_filter((kind, value))
+        if op == "add":
+            adds.append(Favorite(product_id=product_id, **owner_fields))
+        else:
+            removals |= Q(product_id=product_id, **owner_fields)
+
+    if adds:
+        Favorite.objects.bulk_create(adds, ignore_conflicts=True)
+    if removals:
+        Favorite.objects.filter(removals).delete()
+    return len(latest)
+
+
+def flush_pending(max_batches: int = 100) -> int:
+    """
+    Разбирает очередь write-behind пачками; возвращает число применённых операций.
+    Список processing один, поэтому разбирает один процесс за раз (замок в кэше).
+    """
+    if not write_behind_enabled():
+        return 0
+    if not cache.add(FAVORITES_FLUSH_LOCK_KEY, 1, FAVORITES_FLUSH_LOCK_TIMEOUT):
+        return 0
+    conn = _redis()
+    applied = 0
+    try:
+        for _ in range(max_batches):
+            operations = _claim_batch(conn, FAVORITES_FLUSH_BATCH)
+            if not operations:
+                break
+            with transaction.atomic():
+                applied += apply_operations(operations)
+            # подтверждаем пачку только после коммита; при ошибке она остаётся в processing
+            conn.delete(FAVORITES_PROCESSING_KEY)
+    finally:
+        cache.delete(FAVORITES_FLUSH_LOCK_KEY)
+    return applied
+
+
+def merge_guest_favorites(request, user) -> None:
+    """
+    Переносит гостевое избранное пользователю при логине: один bulk_create
+    с ignore_conflicts и удаление гостевых строк.
+
+    Общую очередь здесь не разбираем: актуальный набор гостя уже лежит в кэше
+    (переключения пишут его сразу), а его ещё не применённые операции флаг
+    FAVORITES_MERGED_KEY отбрасывает при следующем flush_pending.
+    """
+    session = getattr(request, "session", None)
+    token = session.get(GUEST_TOKEN_SESSION_KEY) if session is not None else None
+    if not token:
+        return
+    guest = ("s", token)
+    guest_ids = load_ids(guest)
+    if write_behind_enabled():
+        cache.set(FAVORITES_MERGED_KEY.format(token=token), 1, FAVORITES_CACHE_TIMEOUT)
+    guest_ids = set(Product.objects.filter(pk__in=guest_ids).values_list("pk", flat=True))
+    if guest_ids:
+        Favorite.objects.bulk_create(
+            [Favorite(user=user, product_id=pk) for pk in guest_ids], ignore_conflicts=True
+        )
+        if cache_enabled():
+            user_key = _cache_key(("u", user.pk))
+            user_ids = cache.get(user_key)
+            if user_ids is not None:
+                cache.set(user_key, user_ids | guest_ids, FAVORITES_CACHE_TIMEOUT)
+    Favorite.objects.filter(session_key=token).delete()
+    cache.delete(_cache_key(guest))
+    session.pop(GUEST_TOKEN_SESSION_KEY, None)
+    request._favorites_store = None
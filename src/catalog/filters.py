@@ -0,0 +1,83 @@
+# catalog/filters.py
+from django.db.models import Case, IntegerField, Q, When
+
+from .search import search_product_ids
+
+ORDERINGS = {"price_asc", "price_desc", "newest"}
+CONDITIONS = {"A", "B", "C"}
+
+
+def _is_number(value: str) -> bool:
+    return value.replace(".", "", 1).isdigit()
+
+
+def parse_product_filters(params) -> dict:
+    """
+    Читает фильтры каталога из querystring (request.GET или любой dict).
+    Значения остаются строками — в таком виде они уходят в шаблон как `current`.
+    """
+    return {
+        "brand": params.get("brand", "").strip(),
+        "storage": params.get("storage", "").strip(),
+        "cond": params.get("cond", "").strip(),
+        "price_min": params.get("price_min", "").strip(),
+        "price_max": params.get("price_max", "").strip(),
+        "q": params.get("q", "").strip(),
+        "o": params.get("o", "").strip(),  # price_asc | price_desc | newest
+    }
+
+
+def filter_products(qs, filters: dict):
+    """
+    Применяет к queryset товаров фильтры бренда, памяти, состояния и цены.
+    Поиск и сортировка сюда не входят — у них свои пути.
+    """
+    if filters.get("brand"):
+        qs = qs.filter(brand__slug=filters["brand"])
+    if filters.get("storage", "").isdigit():
+        qs = qs.filter(storage_gb=int(filters["storage"]))
+    if filters.get("cond") in CONDITIONS:
+        qs = qs.filter(condition=filters["cond"])
+    if _is_number(filters.get("price_min", "")):
+        qs = qs.filter(price__gte=filters["price_min"])
+    if _is_number(filters.get("price_max", "")):
+        qs = qs.filter(price__lte=filters["price_max"])
+    return qs
+
+
+def search_products(qs, search: str):
+    """
+    Поиск по полнотекстовому индексу (catalog.search) среди товаров qs — лимит
+    выдачи применяется после фильтров. Возвращает (qs, ranked_ids): ranked_ids —
+    id по релевантности, None если поиска не было или индекс недоступен.
+    """
+    if not search:
+        return qs, None
+    ranked_ids = search_product_ids(search, within=qs)
+    if ranked_ids is None:
+        return search_products_icontains(qs, search), None
+    return qs.filter(id__in=ranked_ids), ranked_ids
+
+
+def search_products_icontains(qs, search: str):
+    return qs.filter(
+        Q(translations__title__icontains=search) |
+        Q(model_name__icontains=search) |
+        Q(color__icontains=search) |
+        Q(sku__icontains=search)
+    ).distinct()
+
+
+def order_products(qs, ordering: str, ranked_ids=None):
+    if ordering == "price_asc":
+        return qs.order_by("price")
+    if ordering == "price_desc":
+        return qs.order_by("-price")
+    if ranked_ids and ordering != "newest":
+        # при поиске без явной сортировки — по релевантности
+        relevance = Case(
+            *[When(id=pk, then=pos) for pos, pk in enumerate(ranked_ids)],
+            output_field=IntegerField(),
+        )
+        return qs.order_by(relevance, "-created_at")
+    return qs.order_by("-created_at")
@@ -0,0 +1,119 @@
+# catalog/fragments.py
+"""
+Кэш HTML-фрагментов каталога (сетка, карточка товара, новинки на главной).
+
+Ключ — имя фрагмента, нормализованные параметры, язык и версия каталога.
+Версия — строка CatalogVersion в БД (общая для всех воркеров, не сбрасывается
+при очистке кэша), её поднимают сигналы при изменении товаров, картинок,
+брендов и категорий; старые ключи просто перестают читаться и истекают по
+таймауту. Внутри HTTP-запроса версия читается из БД один раз.
+
+Фрагменты рендерятся без данных посетителя: вместо CSRF-токена — заглушка,
+сердечки избранного — выключены, с маркерами data-fav. После чтения из кэша
+personalize() подставляет токен и включает сердечки из набора избранного.
+В общей странице (request.shared_page) заглушка остаётся — токен подставит
+скрипт в браузере.
+"""
+import hashlib
+import time
+
+from asgiref.local import Local
+from django.core.cache import cache
+from django.db.models import F
+from django.middleware.csrf import get_token
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+from .favorites import get_store
+from .models import CatalogVersion, Category
+
+FRAGMENT_CACHE_TIMEOUT = 15 * 60
+CSRF_PLACEHOLDER = "__csrf_token_placeholder__"
+
+FAV_MARKER = 'class="fav-toggle-btn" data-fav="{}"'
+FAV_MARKER_ACTIVE = 'class="fav-toggle-btn active" data-fav="{}"'
+FAV_ICON = 'data-fav-icon="{}" fill="none"'
+FAV_ICON_ACTIVE = 'data-fav-icon="{}" fill="currentColor"'
+
+# версия, прочитанная в текущем запросе (сбрасывается сигналами request_started/finished)
+_memo = Local()
+
+
+def _initial_version() -> int:
+    return int(time.time())
+
+
+def get_catalog_version() -> int:
+    version = getattr(_memo, "version", None)
+    if version is None:
+        version = CatalogVersion.objects.filter(pk=1).values_list("version", flat=True).first()
+        if version is None:
+            version = CatalogVersion.objects.get_or_create(pk=1, defaults={"version": _initial_version()})[0].version
+        if getattr(_memo, "in_request", False):
+            _memo.version = version
+    return version
+
+
+def bump_catalog_version() -> None:
+    if not CatalogVersion.objects.filter(pk=1).update(version=F("version") + 1):
+        CatalogVersion.objects.get_or_create(pk=1, defaults={"version": _initial_version()})
+    _memo.version = None
+
+
+def start_request_memo(**kwargs) -> None:
+    _memo.in_request = True
+    _memo.version = None
+
+
+def end_request_memo(**kwargs) -> None:
+    _memo.in_request = False
+    _memo.version = None
+
+
+def fragment_key(name: str, params=None) -> str:
+    """Ключ фрагмента; params — dict, пустые значения отбрасываются, порядок не важен."""
+    items = sorted((k, str(v)) for k, v in (params or {}).items() if v not in (None, ""))
+    digest = hashlib.md5(repr(items).encode()).hexdigest()
+    return f"catalog:frag:{name}:v{get_catalog_version()}:{get_language()}:{digest}"
+
+
+def fragment_context(**context) -> dict:
+    """Контекст рендера кэшируемого фрагмента: без CSRF и избранного посетителя."""
+    context.setdefault("csrf_token", CSRF_PLACEHOLDER)
+    context.setdefault("fav_ids", ())
+    return context
+
+
+def personalize(request, html: str) -> str:
+    """Подставляет в закэшированный HTML данные текущего посетителя."""
+    if CSRF_PLACEHOLDER in html and not getattr(request, "shared_page", False):
+        html = html.replace(CSRF_PLACEHOLDER, get_token(request))
+    if "data-fav=" in html:
+        for pk in get_store(request).ids():
+            html = html.replace(FAV_MARKER.format(pk), FAV_MARKER_ACTIVE.format(pk))
+            html = html.replace(FAV_ICON.format(pk), FAV_ICON_ACTIVE.format(pk))
+    return html
+
+
+def cached_fragments(request, name: str, params, build, timeout: int = FRAGMENT_CACHE_TIMEOUT) -> dict:
+    """
+    Возвращает dict HTML-строк фрагмента. build() вызывается только при промахе
+    и рендерит их с fragment_context(); результат кладётся в кэш как есть.
+    """
+    key = fragment_key(name, params)
+    parts = cache.get(key)
+    if parts is None:
+        parts = build()
+        cache.set(key, parts, timeout)
+    return {part: mark_safe(personalize(request, html)) for part, html in parts.items()}
+
+
+def get_category(slug: str):
+    """Категория по slug из кэша той же версии; None, если такой нет."""
+    key = fragment_key("category", {"slug": slug})
+    found = cache.get(key)
+    if found is None:
+        # переводы вместе с объектом, чтобы название не требовало запроса после кэша
+        found = Category.objects.filter(slug=slug).prefetch_related("translations").first() or False
+        cache.set(key, found, FRAGMENT_CACHE_TIMEOUT)
+    return found or None
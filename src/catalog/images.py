@@ -0,0 +1,103 @@
+# catalog/images.py
+"""
+Производные размеры фото товаров.
+
+Из оригинала (в хранилище, обычно Spaces) делаются WebP и JPEG фиксированной
+ширины и крошечная размытая заглушка в виде data URI. Файлы кладутся рядом
+с оригиналом, имена записываются в ProductImage.variants — шаблоны строят из
+них srcset. Генерация идёт в Celery после загрузки; для старых фото есть
+команда generate_image_variants.
+"""
+import base64
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .models import ProductImage
+
+VARIANT_WIDTHS = (320, 640, 1024)
+# формат -> (формат PIL, расширение, параметры сохранения)
+VARIANT_FORMATS = {
+    "webp": ("WEBP", "webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "jpg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+PLACEHOLDER_WIDTH = 16
+
+
+def needs_variants(image) -> bool:
+    return bool(image.file) and image.variants.get("source") != image.file.name
+
+
+def _widths(original_width: int) -> list:
+    widths = [w for w in VARIANT_WIDTHS if w < original_width]
+    # последний вариант — оригинал, но не шире максимальной ширины
+    widths.append(min(original_width, VARIANT_WIDTHS[-1]))
+    return sorted(set(widths))
+
+
+def _encode(img, fmt: str) -> bytes:
+    pil_format, _ext, options = VARIANT_FORMATS[fmt]
+    buffer = BytesIO()
+    img.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def _placeholder(img) -> str:
+    small = img.copy()
+    small.thumbnail((PLACEHOLDER_WIDTH, PLACEHOLDER_WIDTH * 4))
+    buffer = BytesIO()
+    small.save(buffer, "JPEG", quality=40)
+    return "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+def build_variants(image) -> tuple:
+    """Рендерит и сохраняет варианты в хранилище. Возвращает (variants, placeholder)."""
+    storage = image.file.storage
+    with storage.open(image.file.name, "rb") as fh:
+        img = Image.open(fh)
+        img = ImageOps.exif_transpose(img).convert("RGB")
+    width, height = img.size
+    stem = os.path.splitext(image.file.name)[0]
+
+    variants = {"source": image.file.name, "width": width, "height": height}
+    for fmt, (_pil_format, ext, _options) in VARIANT_FORMATS.items():
+        variants[fmt] = {}
+        for w in _widths(width):
+            resized = img if w == width else img.resize((w, round(height * w / width)), Image.LANCZOS)
+            name = storage.save(f"{stem}_w{w}.{ext}", ContentFile(_encode(resized, fmt)))
+            variants[fmt][str(w)] = name
+    return variants, _placeholder(img)
+
+
+def delete_variants(variants: dict, storage) -> None:
+    for fmt in VARIANT_FORMATS:
+        for name in (variants.get(fmt) or {}).values():
+            storage.delete(name)
+
+
+def process_image(image_id, force: bool = False) -> bool:
+    """
+    Делает варианты для одного ProductImage, если оригинал новый (или force).
+    Пишет через update(), чтобы не зацикливаться на post_save; файлы прежних
+    вариантов удаляются после записи новых.
+    """
+    image = ProductImage.objects.filter(pk=image_id).first()
+    if image is None or not image.file or not (force or needs_variants(image)):
+        return False
+    previous = image.variants
+    variants, placeholder = build_variants(image)
+    ProductImage.objects.filter(pk=image.pk).update(variants=variants, placeholder=placeholder)
+    if previous:
+        delete_variants(previous, image.file.storage)
+    return True
+
+
+def srcset(variants: dict, fmt: str) -> str:
+    """Строка srcset из variants: «url 320w, url 640w, …»."""
+    names = (variants or {}).get(fmt) or {}
+    storage = ProductImage._meta.get_field("file").storage
+    return ", ".join(
+        f"{storage.url(name)} {width}w" for width, name in sorted(names.items(), key=lambda item: int(item[0]))
+    )
@@ -0,0 +1,49 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from catalog.fragments import bump_catalog_version
+from catalog.images import process_image
+from catalog.models import ProductImage
+
+
+def _process(image_id, force=False):
+    try:
+        return image_id, process_image(image_id, force=force), None
+    except Exception as exc:  # одно битое фото не должно останавливать весь прогон
+        return image_id, False, str(exc)
+
+
+class Command(BaseCommand):
+    help = "Делает варианты размеров (WebP/JPEG + заглушка) для фото товаров, у которых их нет."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="Число процессов (по умолчанию — число ядер).")
+        parser.add_argument("--force", action="store_true",
+                            help="Пересоздать варианты и для уже обработанных фото.")
+
+    def handle(self, *args, **options):
+        # variants не обнуляем: по ним process_image удаляет файлы прежних вариантов
+        ids = list(ProductImage.objects.order_by("id").values_list("id", flat=True))
+        if not ids:
+            self.stdout.write("No images.")
+            return
+
+        # Дочерние процессы не должны унаследовать открытое соединение с БД
+        connections.close_all()
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=max(1, options["workers"])) as pool:
+            for image_id, processed, error in pool.map(partial(_process, force=options["force"]), ids, chunksize=8):
+                if error:
+                    failed += 1
+                    self.stderr.write(f"Image {image_id}: {error}")
+                elif processed:
+                    done += 1
+
+        if done:
+            bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f"Variants generated: {done}, failed: {failed}, total: {len(ids)}."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.search import get_backend
+
+
+class Command(BaseCommand):
+    help = "Пересобирает полнотекстовый индекс товаров (catalog_product_search)."
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        if backend is None:
+            raise CommandError("Full-text search is not supported for this database.")
+        backend.create()
+        backend.reindex()
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
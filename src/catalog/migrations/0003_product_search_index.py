@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from catalog.search import get_backend
+
+    backend = get_backend(schema_editor.connection)
+    if backend is None:
+        return
+    backend.create()
+    backend.reindex()
+
+
+def drop_search_index(apps, schema_editor):
+    from catalog.search import get_backend
+
+    backend = get_backend(schema_editor.connection)
+    if backend is not None:
+        backend.drop()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0002_productimage_uniq_product_pos_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
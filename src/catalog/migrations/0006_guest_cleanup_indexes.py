@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_productimage_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(condition=models.Q(('user__isnull', True)), fields=['updated_at'], name='fav_guest_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:52
+
+import time
+
+from django.db import migrations, models
+
+
+def create_version_row(apps, schema_editor):
+    CatalogVersion = apps.get_model("catalog", "CatalogVersion")
+    CatalogVersion.objects.get_or_create(pk=1, defaults={"version": int(time.time())})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_product_updated_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField()),
+            ],
+        ),
+        migrations.RunPython(create_version_row, migrations.RunPython.noop),
+    ]
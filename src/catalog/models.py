@@ -65,6 +65,11 @@ class Product(TranslatableModel, TimeStamped):
         indexes = [
             models.Index(fields=["category", "price"]),
             models.Index(fields=["condition", "storage_gb"]),
+            # ключи курсорной пагинации каталога
+            models.Index(fields=["created_at", "id"]),
+            models.Index(fields=["price", "id"]),
+            # Last-Modified каталога (catalog.conditional)
+            models.Index(fields=["updated_at"], name="product_updated_idx"),
         ]
         verbose_name = _("Product")
         verbose_name_plural = _("Products")
@@ -78,6 +83,10 @@ class ProductImage(TimeStamped):
     file = models.ImageField(upload_to="products/%Y/%m/")
     alt = models.CharField(max_length=160, blank=True)
     position = models.PositiveSmallIntegerField(default=0)
+    # Производные размеры (catalog.images): {"source": имя оригинала, "width", "height",
+    # "webp": {ширина: имя}, "jpeg": {ширина: имя}}; placeholder — крошечный data URI
+    variants = models.JSONField(default=dict, blank=True, editable=False)
+    placeholder = models.TextField(blank=True, editable=False)
 
     class Meta:
         ordering = ["position", "id"]
@@ -118,4 +127,20 @@ class Favorite(TimeStamped):
         constraints = [
             models.UniqueConstraint(fields=['user', 'product'], name='unique_user_favorite', condition=models.Q(user__isnull=False)),
             models.UniqueConstraint(fields=['session_key', 'product'], name='unique_session_favorite', condition=models.Q(session_key__isnull=False)),
-        ]
\ No newline at end of file
+        ]
+        indexes = [
+            # очистка старого гостевого избранного (cart.maintenance)
+            models.Index(fields=['updated_at'], name='fav_guest_updated_idx', condition=models.Q(user__isnull=True)),
+        ]
+
+class CatalogVersion(models.Model):
+    """
+    Версия каталога для ключей кэша фрагментов (catalog.fragments) — одна
+    строка в БД, общая для всех процессов и воркеров Celery, в отличие от
+    локального кэша процесса. Начинается с unix-времени, чтобы не совпасть
+    с ключами старого счётчика, оставшимися в кэше.
+    """
+    version = models.PositiveBigIntegerField()
+
+    def __str__(self):
+        return f"v{self.version}"
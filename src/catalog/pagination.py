@@ -0,0 +1,118 @@
+# catalog/pagination.py
+"""
+Курсорная (keyset) пагинация списков товаров.
+
+Вместо OFFSET + COUNT(*) следующая страница выбирается условием по ключу
+последнего показанного товара: (created_at, id) для «новых» и (price, id)
+для сортировок по цене. Курсор — непрозрачная строка в querystring.
+Поиск по релевантности сортирует ограниченный набор id (SEARCH_LIMIT),
+поэтому там курсор хранит смещение.
+"""
+import base64
+import json
+from decimal import Decimal
+from urllib.parse import urlencode
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+PER_PAGE = 12
+
+# ordering -> (поле, по убыванию)
+KEYSETS = {
+    "price_asc": ("price", False),
+    "price_desc": ("price", True),
+    "newest": ("created_at", True),
+}
+RELEVANCE = "relevance"
+
+
+def encode_cursor(kind: str, value, pk) -> str:
+    raw = json.dumps([kind, str(value), pk], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """(kind, value, pk) или None для пустого/битого курсора."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        kind, value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return kind, value, int(pk)
+    except (ValueError, TypeError):
+        return None
+
+
+def _parse_value(field: str, value: str):
+    if field == "price":
+        return Decimal(value)
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(value)
+    return parsed
+
+
+class KeysetPage:
+    """Страница для шаблонов: object_list, has_next, next_cursor, total."""
+
+    def __init__(self, object_list, next_cursor=None, total=None, params=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.has_next = next_cursor is not None
+        self.total = total
+        self._params = params
+
+    @property
+    def next_query(self) -> str:
+        """Querystring следующей страницы с сохранением текущих фильтров."""
+        if not self.has_next:
+            return ""
+        params = self._params.copy() if self._params is not None else {}
+        params.pop("page", None)
+        params["cursor"] = self.next_cursor
+        if hasattr(params, "urlencode"):
+            return params.urlencode()
+        return urlencode(params)
+
+
+def keyset_page(qs, ordering: str, cursor: str = "", per_page: int = PER_PAGE,
+                ranked=False, total=None, params=None) -> KeysetPage:
+    """
+    Возвращает страницу товаров после курсора. qs — уже отфильтрованный queryset;
+    сортировку задаёт сама пагинация. ranked=True — qs уже отсортирован по
+    релевантности поиска, курсор в этом случае — смещение.
+    """
+    decoded = decode_cursor(cursor)
+
+    if ranked and ordering not in KEYSETS:
+        offset = decoded[2] if decoded and decoded[0] == RELEVANCE else 0
+        rows = list(qs[offset:offset + per_page + 1])
+        next_cursor = encode_cursor(RELEVANCE, "", offset + per_page) if len(rows) > per_page else None
+        return KeysetPage(rows[:per_page], next_cursor, total, params)
+
+    field, descending = KEYSETS.get(ordering, KEYSETS["newest"])
+    kind = ordering if ordering in KEYSETS else "newest"
+    if descending:
+        qs = qs.order_by(f"-{field}", "-id")
+    else:
+        qs = qs.order_by(field, "id")
+
+    if decoded and decoded[0] == kind:
+        try:
+            value = _parse_value(field, decoded[1])
+        except (ValueError, ArithmeticError):
+            value = None
+        if value is not None:
+            op = "lt" if descending else "gt"
+            qs = qs.filter(
+                Q(**{f"{field}__{op}": value}) | Q(**{field: value, f"id__{op}": decoded[2]})
+            )
+
+    rows = list(qs[:per_page + 1])
+    next_cursor = None
+    if len(rows) > per_page:
+        last = rows[per_page - 1]
+        value = last.created_at.isoformat() if field == "created_at" else last.price
+        next_cursor = encode_cursor(kind, value, last.pk)
+    return KeysetPage(rows[:per_page], next_cursor, total, params)
@@ -0,0 +1,279 @@
+# catalog/search.py
+"""
+Полнотекстовый поиск по каталогу для параметра `q`.
+
+Индекс — отдельная таблица catalog_product_search, которую ведём сами:
+  * Postgres: tsvector с весами + GIN, плюс pg_trgm по тексту для опечаток;
+  * SQLite: виртуальная таблица FTS5 и fts5vocab для подбора похожих слов.
+В документ товара входят заголовки на всех языках (ka, en), бренд, модель,
+цвет и SKU. Поиск возвращает id товаров по убыванию релевантности — дальше
+они идут через обычные фильтры и сортировку product_list.
+
+Ограничение SEARCH_LIMIT применяется уже после фильтров витрины: within —
+queryset товаров (опубликованные, в наличии, фильтры), он уходит в запрос к
+индексу подзапросом `id IN (...)`, так что скрытые и отфильтрованные товары
+не занимают места в выдаче.
+"""
+import difflib
+import re
+from bisect import bisect_left
+
+from django.db import connection as default_connection
+
+SEARCH_TABLE = "catalog_product_search"
+SEARCH_VOCAB_TABLE = "catalog_product_search_vocab"
+SEARCH_LANGUAGES = ("ka", "en")
+SEARCH_LIMIT = 500
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(query: str) -> list:
+    return [t.lower() for t in TOKEN_RE.findall(query or "")][:8]
+
+
+def _source_sql(where: str = "") -> str:
+    """
+    SELECT с полями документа: id, заголовки (все языки), бренд, модель, цвет, sku.
+    Общий для обоих бэкендов, чтобы состав документа не разъезжался.
+    """
+    joins = []
+    titles = []
+    for code in SEARCH_LANGUAGES:
+        alias = f"t_{code}"
+        joins.append(
+            f"LEFT JOIN catalog_product_translation {alias} "
+            f"ON {alias}.master_id = p.id AND {alias}.language_code = '{code}'"
+        )
+        titles.append(f"COALESCE({alias}.title, '')")
+    title_sql = " || ' ' || ".join(titles)
+    return (
+        f"SELECT p.id, {title_sql}, b.name, p.model_name, p.color, p.sku "
+        f"FROM catalog_product p JOIN catalog_brand b ON b.id = p.brand_id "
+        f"{' '.join(joins)} {where}"
+    )
+
+
+def _within_clause(column: str, within) -> tuple:
+    """AND column IN (SELECT id ...) для queryset товаров; пустое условие, если within нет."""
+    if within is None:
+        return "", []
+    sql, params = within.order_by().values("id").query.sql_with_params()
+    return f" AND {column} IN ({sql})", list(params)
+
+
+def _in_clause(column: str, ids) -> tuple:
+    ids = [int(pk) for pk in ids]
+    return f"WHERE {column} IN ({', '.join(['%s'] * len(ids))})", ids
+
+
+class SqliteSearchBackend:
+    # веса bm25 по колонкам: title, brand, model_name, color, sku
+    WEIGHTS = (5.0, 3.0, 8.0, 1.0, 2.0)
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def create(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+                "title, brand, model_name, color, sku, "
+                "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')"
+            )
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_VOCAB_TABLE} "
+                f"USING fts5vocab({SEARCH_TABLE}, 'row')"
+            )
+
+    def drop(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_VOCAB_TABLE}")
+            cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+    def reindex(self, product_ids=None):
+        with self.connection.cursor() as cursor:
+            if product_ids is None:
+                cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+                where, params = "", []
+            else:
+                if not product_ids:
+                    return
+                where, params = _in_clause("rowid", product_ids)
+                cursor.execute(f"DELETE FROM {SEARCH_TABLE} {where}", params)
+                where, params = _in_clause("p.id", product_ids)
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, title, brand, model_name, color, sku) "
+                + _source_sql(where),
+                params,
+            )
+
+    def remove(self, product_ids):
+        if not product_ids:
+            return
+        where, params = _in_clause("rowid", product_ids)
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} {where}", params)
+
+    def _vocabulary(self, cursor) -> list:
+        cursor.execute(f"SELECT term FROM {SEARCH_VOCAB_TABLE} ORDER BY term")
+        return [row[0] for row in cursor.fetchall()]
+
+    @staticmethod
+    def _has_prefix(terms: list, token: str) -> bool:
+        pos = bisect_left(terms, token)
+        return pos < len(terms) and terms[pos].startswith(token)
+
+    def _match_expression(self, tokens, alternatives=None) -> str:
+        parts = []
+        for token in tokens:
+            options = [f'"{token}"*'] + [f'"{alt}"' for alt in (alternatives or {}).get(token, [])]
+            parts.append("(" + " OR ".join(options) + ")")
+        return " AND ".join(parts)
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT, within=None) -> list:
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        weights = ", ".join(str(w) for w in self.WEIGHTS)
+        restrict, restrict_params = _within_clause("rowid", within)
+        sql = (
+            f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s{restrict} "
+            f"ORDER BY bm25({SEARCH_TABLE}, {weights}) LIMIT %s"
+        )
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, [self._match_expression(tokens), *restrict_params, limit])
+            ids = [row[0] for row in cursor.fetchall()]
+            if ids:
+                return ids
+            # Ничего не нашли — подбираем похожие слова из словаря индекса для
+            # токенов, у которых нет ни одного совпадения по префиксу.
+            terms = self._vocabulary(cursor)
+            alternatives = {}
+            for token in tokens:
+                if not self._has_prefix(terms, token):
+                    alternatives[token] = difflib.get_close_matches(token, terms, n=3, cutoff=0.7)
+            if not any(alternatives.values()):
+                return []
+            cursor.execute(sql, [self._match_expression(tokens, alternatives), *restrict_params, limit])
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend:
+    TRIGRAM_THRESHOLD = 0.4
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def create(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+                "product_id bigint PRIMARY KEY REFERENCES catalog_product (id) "
+                "ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+                "body text NOT NULL, "
+                "document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_document_gin "
+                f"ON {SEARCH_TABLE} USING gin (document)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_body_trgm "
+                f"ON {SEARCH_TABLE} USING gin (body gin_trgm_ops)"
+            )
+
+    def drop(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+    def reindex(self, product_ids=None):
+        where, params = "", []
+        if product_ids is not None:
+            if not product_ids:
+                return
+            where, params = _in_clause("p.id", product_ids)
+        # Заголовки и модель — вес A, бренд — B, цвет и SKU — C
+        sql = (
+            f"INSERT INTO {SEARCH_TABLE} (product_id, body, document) "
+            "SELECT id, concat_ws(' ', title, brand, model_name, color, sku), "
+            "setweight(to_tsvector('simple', title || ' ' || model_name), 'A') || "
+            "setweight(to_tsvector('simple', brand), 'B') || "
+            "setweight(to_tsvector('simple', color || ' ' || sku), 'C') "
+            f"FROM ({_source_sql(where)}) AS src (id, title, brand, model_name, color, sku) "
+            "ON CONFLICT (product_id) DO UPDATE SET body = EXCLUDED.body, document = EXCLUDED.document"
+        )
+        with self.connection.cursor() as cursor:
+            if product_ids is None:
+                cursor.execute(f"TRUNCATE {SEARCH_TABLE}")
+            cursor.execute(sql, params)
+
+    def remove(self, product_ids):
+        if not product_ids:
+            return
+        where, params = _in_clause("product_id", product_ids)
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} {where}", params)
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT, within=None) -> list:
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        tsquery = " & ".join(f"{token}:*" for token in tokens)
+        restrict, restrict_params = _within_clause("product_id", within)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT product_id FROM {SEARCH_TABLE}, to_tsquery('simple', %s) AS q "
+                f"WHERE document @@ q{restrict} "
+                "ORDER BY ts_rank_cd(document, q) DESC, product_id DESC LIMIT %s",
+                [tsquery, *restrict_params, limit],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+            if ids:
+                return ids
+            # Опечатки: похожесть по триграммам (индекс gin_trgm_ops по body)
+            text = " ".join(tokens)
+            cursor.execute(
+                f"SELECT product_id FROM {SEARCH_TABLE} "
+                f"WHERE word_similarity(%s, body) >= %s{restrict} "
+                "ORDER BY word_similarity(%s, body) DESC, product_id DESC LIMIT %s",
+                [text, self.TRIGRAM_THRESHOLD, *restrict_params, text, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+BACKENDS = {
+    "postgresql": PostgresSearchBackend,
+    "sqlite": SqliteSearchBackend,
+}
+
+
+def get_backend(connection=None):
+    """Бэкенд под текущую БД или None, если движок не поддерживается."""
+    connection = connection or default_connection
+    backend_class = BACKENDS.get(connection.vendor)
+    return backend_class(connection) if backend_class else None
+
+
+def search_product_ids(query: str, limit: int = SEARCH_LIMIT, within=None):
+    """
+    Id товаров по релевантности (только из queryset within, если он задан).
+    None — полнотекстовый индекс недоступен, вызывающий код падает обратно на icontains.
+    """
+    backend = get_backend()
+    if backend is None:
+        return None
+    return backend.search(query, limit, within)
+
+
+def reindex_products(product_ids=None):
+    backend = get_backend()
+    if backend is not None:
+        backend.reindex(product_ids)
+
+
+def remove_products(product_ids):
+    backend = get_backend()
+    if backend is not None:
+        backend.remove(product_ids)
@@ -0,0 +1,98 @@
+# catalog/serializers.py
+"""
+Сериализаторы публичного API каталога (catalog.api).
+
+Ничего не читают по объекту: заголовок и главное фото — аннотации
+with_card_data, бренд и категория — select_related, переводы категорий и
+описание товара — пакетом (prefetch_translations / prefetch_related).
+"""
+from rest_framework import serializers
+
+from . import images
+from .models import Brand, Category, Product, ProductImage
+
+
+def _file_url(name) -> str:
+    return ProductImage._meta.get_field("file").storage.url(name) if name else ""
+
+
+def _image(name, variants) -> dict:
+    if not name:
+        return None
+    variants = variants or {}
+    return {
+        "url": _file_url(name),
+        "width": variants.get("width"),
+        "height": variants.get("height"),
+        "srcset_webp": images.srcset(variants, "webp"),
+        "srcset_jpeg": images.srcset(variants, "jpeg"),
+    }
+
+
+class SparseFieldsMixin:
+    """?fields=id,title,price — в ответе только перечисленные поля (неизвестные имена игнорируются)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        wanted = request.query_params.get("fields", "") if request is not None else ""
+        keep = {name.strip() for name in wanted.split(",") if name.strip()}
+        if keep & set(self.fields):
+            for name in set(self.fields) - keep:
+                self.fields.pop(name)
+
+
+class BrandSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Brand
+        fields = ("id", "slug", "name")
+
+
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    name = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Category
+        fields = ("id", "slug", "parent", "name")
+
+    def get_name(self, obj):
+        return obj.safe_translation_getter("name", any_language=True) or ""
+
+
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    slug = serializers.CharField(source="base_slug")
+    title = serializers.SerializerMethodField()
+    brand = BrandSerializer()
+    category = serializers.SlugRelatedField(slug_field="slug", read_only=True)
+    image = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = (
+            "id", "slug", "sku", "title", "brand", "category", "model_name", "condition",
+            "storage_gb", "color", "battery_health_percent", "warranty_months",
+            "price", "old_price", "currency", "in_stock", "image", "updated_at",
+        )
+
+    def get_title(self, obj):
+        return obj.card_title or str(obj)
+
+    def get_image(self, obj):
+        return _image(obj.card_image, obj.card_image_variants)
+
+
+class ProductDetailSerializer(ProductSerializer):
+    description = serializers.SerializerMethodField()
+    images = serializers.SerializerMethodField()
+
+    class Meta(ProductSerializer.Meta):
+        fields = ProductSerializer.Meta.fields + ("description", "images")
+
+    def get_description(self, obj):
+        return obj.safe_translation_getter("description", any_language=True) or ""
+
+    def get_images(self, obj):
+        return [
+            dict(_image(img.file.name, img.variants), alt=img.alt)
+            for img in obj.images.all() if img.file
+        ]
@@ -0,0 +1,34 @@
+# catalog/services.py
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.translation import get_language
+from parler.utils.i18n import get_active_language_choices
+
+from .models import Product, ProductImage
+
+ProductTranslation = Product._parler_meta.root_model
+
+
+def with_card_data(qs, language_code=None):
+    """
+    Добавляет к queryset товаров всё, что нужно карточке каталога, в том же запросе:
+      * card_image / card_image_alt — главное фото (минимальная position, затем id),
+        card_image_variants / card_image_placeholder — его размеры для srcset;
+      * card_title — заголовок на активном языке с fallback-языками parler.
+    Число запросов не зависит от размера страницы: шаблоны больше не ходят
+    в p.images.first и p.translations по каждой карточке.
+    """
+    images = ProductImage.objects.filter(product=OuterRef("pk")).order_by("position", "id")
+    titles = [
+        Subquery(
+            ProductTranslation.objects.filter(master=OuterRef("pk"), language_code=code).values("title")[:1]
+        )
+        for code in get_active_language_choices(language_code or get_language())
+    ]
+    return qs.select_related("brand").annotate(
+        card_image=Subquery(images.values("file")[:1]),
+        card_image_alt=Subquery(images.values("alt")[:1]),
+        card_image_variants=Subquery(images.values("variants")[:1]),
+        card_image_placeholder=Subquery(images.values("placeholder")[:1]),
+        card_title=Coalesce(*titles) if len(titles) > 1 else titles[0],
+    )
@@ -0,0 +1,88 @@
+# catalog/signals.py
+from django.contrib.auth.signals import user_logged_in
+from django.core.signals import request_finished, request_started
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from config.background import run_after_commit
+from . import favorites, images, search
+from .fragments import bump_catalog_version, end_request_memo, start_request_memo
+from .models import Brand, Category, Product, ProductImage
+from .tasks import generate_image_variants
+
+ProductTranslation = Product._parler_meta.root_model
+CategoryTranslation = Category._parler_meta.root_model
+
+# Любое изменение этих моделей делает закэшированные фрагменты каталога устаревшими
+VERSIONED_MODELS = (Product, ProductTranslation, ProductImage, Brand, Category, CategoryTranslation)
+
+
+def _reindex_on_commit(product_ids):
+    product_ids = list(product_ids)
+    transaction.on_commit(lambda: search.reindex_products(product_ids))
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _reindex_on_commit([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    search.remove_products([instance.pk])
+
+
+@receiver(post_save, sender=ProductTranslation)
+def product_translation_saved(sender, instance, raw=False, **kwargs):
+    # parler сохраняет переводы после самого товара — документ пересобираем ещё раз
+    if raw or not instance.master_id:
+        return
+    _reindex_on_commit([instance.master_id])
+
+
+@receiver(post_delete, sender=ProductTranslation)
+def product_translation_deleted(sender, instance, **kwargs):
+    if instance.master_id:
+        _reindex_on_commit([instance.master_id])
+
+
+@receiver(post_save, sender=Brand)
+def brand_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _reindex_on_commit(instance.products.values_list("id", flat=True))
+
+
+@receiver(user_logged_in)
+def merge_favorites_on_login(sender, request, user, **kwargs):
+    if request is not None:
+        favorites.merge_guest_favorites(request, user)
+
+
+@receiver(post_save, sender=ProductImage)
+def product_image_saved(sender, instance, raw=False, **kwargs):
+    if raw or not images.needs_variants(instance):
+        return
+    image_id = instance.pk
+    # без воркера делаем варианты сразу после коммита
+    run_after_commit(
+        "IMAGE_VARIANTS_ASYNC", "catalog.tasks.generate_image_variants", image_id,
+        inline=lambda: generate_image_variants(image_id),
+    )
+
+
+def _bump_version(sender, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(bump_catalog_version)
+
+
+for _model in VERSIONED_MODELS:
+    post_save.connect(_bump_version, sender=_model, dispatch_uid=f"catalog_version_save_{_model.__name__}")
+    post_delete.connect(_bump_version, sender=_model, dispatch_uid=f"catalog_version_delete_{_model.__name__}")
+
+
+request_started.connect(start_request_memo, dispatch_uid="catalog_version_memo_start")
+request_finished.connect(end_request_memo, dispatch_uid="catalog_version_memo_end")
@@ -0,0 +1,18 @@
+from celery import shared_task
+
+from .favorites import flush_pending
+from .fragments import bump_catalog_version
+from .images import process_image
+
+
+@shared_task
+def flush_favorites():
+    """Задача для Celery Beat: переносит отложенные переключения избранного в БД"""
+    return flush_pending()
+
+
+@shared_task
+def generate_image_variants(image_id):
+    """Варианты размеров для загруженного фото; кэш фрагментов сбрасываем, чтобы появился srcset"""
+    if process_image(image_id):
+        bump_catalog_version()
@@ -0,0 +1,31 @@
+# catalog/templatetags/catalog_extras.py
+from django import template
+
+from catalog import images
+from catalog.models import ProductImage
+
+register = template.Library()
+
+
+@register.filter
+def media_url(name):
+    """URL файла из хранилища ProductImage по имени (например, аннотации card_image)."""
+    if not name:
+        return ""
+    return ProductImage._meta.get_field("file").storage.url(name)
+
+
+@register.filter
+def srcset(variants, fmt="webp"):
+    """srcset из ProductImage.variants: {{ img.variants|srcset:"webp" }}."""
+    return images.srcset(variants, fmt)
+
+
+@register.filter
+def variant_url(variants, fmt="webp"):
+    """URL самого широкого варианта; пусто, если вариантов ещё нет."""
+    names = (variants or {}).get(fmt) or {}
+    if not names:
+        return ""
+    widest = max(names, key=int)
+    return media_url(names[widest])
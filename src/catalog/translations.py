@@ -0,0 +1,92 @@
+# catalog/translations.py
+"""
+Пакетная загрузка переводов parler.
+
+parler ищет перевод по одному объекту: свой кэш объекта → общий кэш (ключ на
+объект и язык) → запрос в БД, и для fallback-языка всё повторяется. Здесь то
+же самое делается сразу для списка объектов: один get_many по ключам parler
+для активного языка и fallback, затем один запрос за промахами. Найденное
+кладётся в _translations_cache объектов и в общий кэш с ключами и форматом
+parler — его собственная инвалидация при сохранении перевода продолжает работать.
+
+Кэш и таймаут те же, что у parler (parler.cache.cache, его default_timeout).
+Инвалидация parler работает только в общем кэше, поэтому PARLER_ENABLE_CACHING
+включён лишь с Redis; без него обе стороны читают переводы из БД.
+"""
+from django.utils.translation import get_language
+from parler import appsettings
+from parler.cache import MISSING, cache, get_translation_cache_key
+from parler.utils.i18n import get_active_language_choices
+
+FALLBACK_MARKER = {"__FALLBACK__": True}
+
+
+def _cache_values(translation) -> dict:
+    values = {"id": translation.id}
+    for name in translation.get_translated_fields(include_m2m=False):
+        values[name] = getattr(translation, name)
+    return values
+
+
+def _from_cache(translated_model, obj, language_code, values):
+    if values.get("__FALLBACK__"):
+        return MISSING
+    translation = translated_model(master=obj, language_code=language_code, **values)
+    translation._state.adding = False
+    return translation
+
+
+def prefetch_translations(objects, language_code=None) -> list:
+    """
+    Загружает переводы на активном языке и его fallback-языках для всех объектов
+    разом. Принимает queryset или список TranslatableModel, возвращает список.
+    """
+    objects = list(objects)
+    saved = [obj for obj in objects if obj.pk is not None and not obj._state.adding]
+    if not saved:
+        return objects
+
+    translated_model = saved[0]._parler_meta.root_model
+    languages = get_active_language_choices(language_code or get_language())
+
+    pending = {}
+    for obj in saved:
+        local_cache = obj._translations_cache[translated_model]
+        for code in languages:
+            if code not in local_cache:
+                pending[get_translation_cache_key(translated_model, obj.pk, code)] = (obj, code)
+    if not pending:
+        return objects
+
+    caching = appsettings.PARLER_ENABLE_CACHING
+    cached = cache.get_many(list(pending)) if caching else {}
+    misses = {}
+    for key, (obj, code) in pending.items():
+        values = cached.get(key)
+        if values is None:
+            misses[key] = (obj, code)
+        else:
+            obj._translations_cache[translated_model][code] = _from_cache(translated_model, obj, code, dict(values))
+
+    if misses:
+        found = {
+            (tr.master_id, tr.language_code): tr
+            for tr in translated_model.objects.filter(
+                master_id__in={obj.pk for obj, _code in misses.values()},
+                language_code__in={code for _obj, code in misses.values()},
+            )
+        }
+        to_cache = {}
+        for key, (obj, code) in misses.items():
+            translation = found.get((obj.pk, code))
+            if translation is None:
+                # как parler: маркер «перевода нет, берите fallback»
+                obj._translations_cache[translated_model][code] = MISSING
+                to_cache[key] = FALLBACK_MARKER
+            else:
+                translation.master = obj
+                obj._translations_cache[translated_model][code] = translation
+                to_cache[key] = _cache_values(translation)
+        if caching:
+            cache.set_many(to_cache, timeout=cache.default_timeout)
+    return objects
@@ -1,119 +1,117 @@
-from django.core.paginator import Paginator
-from django.db.models import Q
 from django.shortcuts import get_object_or_404, render
-from .models import Category, Product, Brand, Favorite
+from django.utils.html import conditional_escape
+from .conditional import conditional_page
+from .models import Product
+from .favorites import get_store
+from .facets import facet_counts
+from .fragments import cached_fragments, fragment_context, get_category
+from .pagination import keyset_page
+from .search import search_product_ids
+from .services import with_card_data
+from .translations import prefetch_translations
+from .filters import (
+    ORDERINGS, parse_product_filters, filter_products, search_products, search_products_icontains, order_products,
+)
 from django.template.loader import render_to_string
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import Http404, HttpResponse, HttpResponseRedirect
 from django.views.decorators.http import require_POST
-from .context_processors import favorites_info
 
-def product_list(request, category_slug=None):
-    qs = Product.objects.filter(is_published=True, in_stock__gt=0).select_related("brand", "category")
+def _catalog_page(category, current, cursor):
+    visible = Product.objects.filter(is_published=True, in_stock__gt=0)
+    if category:
+        visible = visible.filter(category=category)
+
+    qs = filter_products(with_card_data(visible), current)
+    qs, ranked_ids = search_products(qs, current["q"])
+    qs = order_products(qs, current["o"], ranked_ids)
+
+    # Счётчики фасетов берём из индекса в кэше; при поиске ограничиваем их найденными товарами.
+    # Найденное уже сужено фильтрами, а фасетам нужны совпадения без них — тогда ищем ещё раз.
+    restrict_ids = None
+    if ranked_ids is not None:
+        filtered = any(current.get(k) for k in ("brand", "storage", "cond", "price_min", "price_max"))
+        restrict_ids = set(search_product_ids(current["q"], within=visible) if filtered else ranked_ids)
+    elif current["q"]:
+        restrict_ids = set(search_products_icontains(Product.objects.all(), current["q"]).values_list("id", flat=True))
+    facets = facet_counts(current, category=category, restrict_ids=restrict_ids)
+
+    # Курсорная пагинация: без OFFSET и без COUNT(*) — итог берём из фасетного индекса.
+    # В ссылку «Показать ещё» идут только нормализованные фильтры — она попадает в кэш.
+    page_obj = keyset_page(
+        qs, current["o"], cursor,
+        ranked=ranked_ids is not None and current["o"] not in ORDERINGS,
+        total=facets["total"], params={k: v for k, v in current.items() if v},
+    )
+    return page_obj, facets
 
+
+@conditional_page
+def product_list(request, category_slug=None):
     category = None
     if category_slug:
-        category = get_object_or_404(Category, slug=category_slug)
-        qs = qs.filter(category=category)
+        category = get_category(category_slug)
+        if category is None:
+            raise Http404
 
     # Фильтры из querystring
-    brand = request.GET.get("brand", "").strip()
-    storage = request.GET.get("storage", "").strip()
-    cond = request.GET.get("cond", "").strip()
-    price_min = request.GET.get("price_min", "").strip()
-    price_max = request.GET.get("price_max", "").strip()
-    search = request.GET.get("q", "").strip()
-    ordering = request.GET.get("o", "").strip()  # price_asc | price_desc | newest
-
-    if brand:
-        qs = qs.filter(brand__slug=brand)
-    if storage.isdigit():
-        qs = qs.filter(storage_gb=int(storage))
-    if cond in {"A", "B", "C"}:
-        qs = qs.filter(condition=cond)
-    if price_min.replace(".", "", 1).isdigit():
-        qs = qs.filter(price__gte=price_min)
-    if price_max.replace(".", "", 1).isdigit():
-        qs = qs.filter(price__lte=price_max)
-    if search:
-        qs = qs.filter(
-            Q(translations__title__icontains=search) |
-            Q(model_name__icontains=search) |
-            Q(color__icontains=search) |
-            Q(sku__icontains=search)
-        ).distinct()
-
-    if ordering == "price_asc":
-        qs = qs.order_by("price")
-    elif ordering == "price_desc":
-        qs = qs.order_by("-price")
+    current = parse_product_filters(request.GET)
+    cursor = request.GET.get("cursor", "")
+    if request.headers.get("HX-Request") != "true":
+        variant = "page"
     else:
-        qs = qs.order_by("-created_at")
-
-    paginator = Paginator(qs, 12)
-    page_obj = paginator.get_page(request.GET.get("page"))
-
-    ctx = {
-        "category": category,
-        "page_obj": page_obj,
-        "brands": Brand.objects.order_by("name"),
-        "storages": [64, 128, 256, 512],
-        "current": {
-            "brand": brand, "storage": storage, "cond": cond,
-            "price_min": price_min, "price_max": price_max,
-            "q": search, "o": ordering,
-        },
-    }
-    if request.headers.get("HX-Request") == "true":
-        ctx.update(favorites_info(request))
-        html = render_to_string("catalog/_product_grid.html", ctx, request=request)
-        return HttpResponse(html)
-    return render(request, "catalog/product_list.html", ctx)
-
+        # «Показать ещё» — только новые карточки и кнопка следующей страницы
+        variant = "more" if cursor else "grid"
+
+    def build():
+        page_obj, facets = _catalog_page(category, current, cursor)
+        ctx = fragment_context(category=category, page_obj=page_obj, facets=facets, current=current)
+        if variant == "page":
+            return {
+                "filters": render_to_string("catalog/_product_filters.html", ctx),
+                "grid": render_to_string("catalog/_product_grid.html", ctx),
+            }
+        template = "catalog/_load_more_response.html" if variant == "more" else "catalog/_product_grid.html"
+        return {"html": render_to_string(template, ctx)}
+
+    params = {**current, "cursor": cursor, "category": category_slug}
+    fragment = cached_fragments(request, f"product_list:{variant}", params, build)
+    if variant != "page":
+        return HttpResponse(fragment["html"])
+    return render(request, "catalog/product_list.html", {"category": category, "fragment": fragment})
+
+@conditional_page
 def product_detail(request, base_slug):
-    product = get_object_or_404(
-        Product.objects.select_related("brand", "category").prefetch_related("images"),
-        base_slug=base_slug, is_published=True
-    )
-    related = Product.objects.filter(
-        brand=product.brand, category=product.category, is_published=True, in_stock__gt=0
-    ).exclude(id=product.id).order_by("-created_at")[:8]
-    return render(request, "catalog/product_detail.html", {"product": product, "related": related})
+    def build():
+        product = get_object_or_404(
+            Product.objects.select_related("brand", "category").prefetch_related("images"),
+            base_slug=base_slug, is_published=True
+        )
+        # заголовок и описание (активный язык + fallback) — одним запросом
+        prefetch_translations([product])
+        related = with_card_data(Product.objects.filter(
+            brand=product.brand, category=product.category, is_published=True, in_stock__gt=0
+        )).exclude(id=product.id).order_by("-created_at")[:8]
+        ctx = fragment_context(product=product, related=related)
+        return {
+            "title": conditional_escape(product.title or product),
+            "body": render_to_string("catalog/_product_detail_body.html", ctx),
+        }
+
+    fragment = cached_fragments(request, "product_detail", {"slug": base_slug}, build)
+    return render(request, "catalog/product_detail.html", {"fragment": fragment})
 
 
 @require_POST
 def toggle_favorite(request, product_id):
     product = get_object_or_404(Product, id=product_id)
 
-    # Получаем или создаем сессию для анонима
-    if not request.user.is_authenticated and not request.session.session_key:
-        request.session.create()
-
-    filter_kwargs = {'product': product}
-    if request.user.is_authenticated:
-        filter_kwargs['user'] = request.user
-    else:
-        filter_kwargs['session_key'] = request.session.session_key
-
-    fav_obj = Favorite.objects.filter(**filter_kwargs).first()
-
-    if fav_obj:
-        fav_obj.delete()
-        is_fav = False
-    else:
-        Favorite.objects.create(**filter_kwargs)
-        is_fav = True
-
-    # Считаем новое общее количество
-    if request.user.is_authenticated:
-        total_favs = Favorite.objects.filter(user=request.user).count()
-    else:
-        total_favs = Favorite.objects.filter(session_key=request.session.session_key).count()
+    # Набор избранного в кэше; в таблицу переключение уходит через очередь
+    store = get_store(request)
+    is_fav = store.toggle(product.id)
 
     if request.headers.get("HX-Request"):
         # Возвращаем обновленную кнопку и OOB-обновление для шапки
-        badge_html = f'<span id="fav-badge" hx-swap-oob="true" class="badge">{total_favs}</span>'
-
-        icon_fill = "currentColor" if is_fav else "none"
+        badge_html = f'<span id="fav-badge" hx-swap-oob="true" class="badge">{store.count()}</span>'
         btn_html = render_to_string("catalog/_fav_button.html",
                                     {'p': product, 'fav_ids': [product.id] if is_fav else []})
 
@@ -123,16 +121,11 @@ def toggle_favorite(request, product_id):
 
 
 def favorite_list(request):
-    # Получаем ID товаров из контекстного процессора (или дублируем логику здесь)
-    if request.user.is_authenticated:
-        fav_ids = Favorite.objects.filter(user=request.user).values_list('product_id', flat=True)
-    else:
-        s_key = request.session.session_key
-        fav_ids = Favorite.objects.filter(session_key=s_key).values_list('product_id', flat=True) if s_key else []
+    fav_ids = get_store(request).ids()
 
-    products = Product.objects.filter(id__in=fav_ids, is_published=True).select_related("brand", "category")
+    products = with_card_data(Product.objects.filter(id__in=fav_ids, is_published=True))
 
     return render(request, "catalog/favorites.html", {
         "page_obj": {"object_list": products},  # Эмулируем структуру для _product_grid
         "is_wishlist": True
-    })
\ No newline at end of file
+    })
@@ -1,18 +1,31 @@
 from django.shortcuts import render
+from django.template.loader import render_to_string
+from catalog.conditional import conditional_page
+from catalog.fragments import cached_fragments, fragment_context
 from catalog.models import Product
+from catalog.services import with_card_data
 
+@conditional_page
 def home(request):
-    latest = Product.objects.filter(is_published=True, in_stock__gt=0).order_by("-created_at")[:8]
-    return render(request, "cms/home.html", {"latest": latest})
+    def build():
+        latest = with_card_data(Product.objects.filter(is_published=True, in_stock__gt=0)).order_by("-created_at")[:8]
+        return {"latest": render_to_string("cms/_latest_products.html", fragment_context(latest=latest))}
 
+    fragment = cached_fragments(request, "home", None, build)
+    return render(request, "cms/home.html", {"latest_html": fragment["latest"]})
+
+@conditional_page
 def contacts(request):
     return render(request, "cms/contacts.html")
 
+@conditional_page
 def delivery(request):
     return render(request, "cms/delivery.html")
 
+@conditional_page
 def warranty(request):
     return render(request, "cms/warranty.html")
 
+@conditional_page
 def faq(request):
     return render(request, "cms/faq.html")
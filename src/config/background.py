@@ -0,0 +1,60 @@
+# config/background.py
+"""
+Фоновая работа после коммита — общая для outbox, вебхуков, привязки заказов
+и вариантов фото.
+
+Флаг в настройках (OUTBOX_ASYNC, PAYMENT_WEBHOOKS_ASYNC, …, по умолчанию
+USE_REDIS) решает, идёт ли работа в Celery. run_after_commit() после коммита
+ставит задачу; без Celery или при недоступном брокере вызывает inline —
+он делает в процессе только работу этой транзакции, остальное заберёт
+периодический проход (Beat или команда на BatchCommand по cron).
+"""
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def is_async(setting: str) -> bool:
+    return getattr(settings, setting, getattr(settings, "USE_REDIS", False))
+
+
+def run_after_commit(setting: str, task: str, *args, inline=None) -> None:
+    """
+    После коммита — task.delay(*args) (task — путь к задаче Celery, импорт
+    откладывается до вызова). Иначе inline(); None — ничего, работа дождётся
+    периодического прохода.
+    """
+    def kick():
+        if is_async(setting):
+            try:
+                import_string(task).delay(*args)
+                return
+            except Exception:
+                logger.warning("%s: broker unavailable, running inline", task, exc_info=True)
+        if inline is not None:
+            inline()
+
+    transaction.on_commit(kick)
+
+
+class BatchCommand(BaseCommand):
+    """Команда для cron без Celery Beat: один проход run(batch_size=...)."""
+
+    batch_size = 100
+    result_label = "Processed"
+
+    def run(self, batch_size: int) -> int:
+        raise NotImplementedError
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=self.batch_size,
+                            help="Сколько записей взять за один запуск.")
+
+    def handle(self, *args, **options):
+        done = self.run(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"{self.result_label}: {done}."))
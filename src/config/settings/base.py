@@ -107,6 +107,7 @@ TEMPLATES = [
                 "cart.context_processors.cart_info",
                 # "cart.context_processors.cart_header",
                 "catalog.context_processors.favorites_info",
+                "catalog.context_processors.shared_page",
             ],
         },
     },
@@ -158,6 +159,30 @@ else:
     }
     SESSION_ENGINE = "django.contrib.sessions.backends.db"
 
+# Избранное пишется в БД через очередь в Redis (catalog.tasks.flush_favorites);
+# без Redis — сразу при переключении
+FAVORITES_WRITE_BEHIND = USE_REDIS
+# Набор избранного посетителя держим в кэше, только если кэш общий для воркеров
+FAVORITES_CACHE = USE_REDIS
+# Варианты размеров фото — в Celery-воркере; без Redis — в запросе после сохранения
+IMAGE_VARIANTS_ASYNC = USE_REDIS
+# Письма по заказам из outbox — в Celery-воркере; без Redis — сразу после коммита
+OUTBOX_ASYNC = USE_REDIS
+# Вебхуки оплаты применяются в Celery-воркере; без Redis — сразу после приёма
+PAYMENT_WEBHOOKS_ASYNC = USE_REDIS
+# Привязка гостевых заказов к новому аккаунту — в Celery-воркере; без Redis — после коммита
+GUEST_ORDER_CLAIM_ASYNC = USE_REDIS
+# Хранилища корзины (cart.backends): гостевая корзина с Redis живёт в кэше
+# и попадает в БД только при оформлении или логине
+CART_USER_BACKEND = "cart.backends.DatabaseCartBackend"
+CART_GUEST_BACKEND = "cart.backends.CacheCartBackend" if USE_REDIS else "cart.backends.DatabaseCartBackend"
+GUEST_CART_TTL = int(os.getenv("GUEST_CART_TTL_DAYS", "14")) * 24 * 3600
+# Очистка гостевых данных в БД (cart.maintenance): сроки хранения и размер пачки
+GUEST_CART_RETENTION_DAYS = int(os.getenv("GUEST_CART_RETENTION_DAYS", "30"))
+GUEST_FAVORITES_RETENTION_DAYS = int(os.getenv("GUEST_FAVORITES_RETENTION_DAYS", "90"))
+GUEST_PURGE_BATCH = int(os.getenv("GUEST_PURGE_BATCH", "1000"))
+GUEST_PURGE_PAUSE = float(os.getenv("GUEST_PURGE_PAUSE", "0.1"))
+
 
 # I18N / L10N
 LANGUAGE_CODE = "ka"  # по умолчанию грузинский
@@ -217,6 +242,9 @@ PARLER_LANGUAGES = {
         "hide_untranslated": False,
     },
 }
+# Кэш переводов parler (и catalog.translations) — только в общем кэше: сброс при
+# сохранении перевода в локальном кэше процесса до других воркеров не доходит
+PARLER_ENABLE_CACHING = USE_REDIS
 
 PAYMENTS = {
     "MOCKPAY_PUBLIC_URL": "/payments/mockpay/callback/",
@@ -226,6 +254,16 @@ PAYMENTS = {
 DEFAULT_FROM_EMAIL = "no-reply@izugdidi.example"
 EMAIL_BACKEND = os.getenv("EMAIL_BACKEND", "django.core.mail.backends.console.EmailBackend")
 
+# Условные GET страниц (catalog.conditional.conditional_page): идентификатор
+# релиза входит в ETag — после деплоя шаблонов старые 304 не отдаются;
+# s-maxage — сколько общий кэш отдаёт страницу анонима без сессии без сверки
+RELEASE_ID = os.getenv("RELEASE_ID", "")
+PAGE_CACHE_S_MAXAGE = int(os.getenv("PAGE_CACHE_S_MAXAGE", "60"))
+
+# Сколько неоплаченный заказ держит списанный под него товар. Потом остаток
+# возвращается на склад, заказ остаётся неоплаченным и при оплате списывает заново
+STOCK_RESERVATION_TTL = timedelta(minutes=int(os.getenv("STOCK_RESERVATION_TTL_MINUTES", "30")))
+
 CELERY_BROKER_URL = f"redis://{os.getenv('REDIS_HOST','redis')}:{os.getenv('REDIS_PORT','6379')}/2"
 CELERY_RESULT_BACKEND = CELERY_BROKER_URL
 
@@ -339,4 +377,24 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'orders.tasks.run_payment_reminders',
         'schedule': 3600.0, # в секундах
     },
+    'release-expired-stock-reservations': {
+        'task': 'orders.tasks.release_expired_reservations',
+        'schedule': 300.0,
+    },
+    'flush-favorites': {
+        'task': 'catalog.tasks.flush_favorites',
+        'schedule': 30.0,
+    },
+    'drain-outbox': {
+        'task': 'orders.tasks.drain_outbox',
+        'schedule': 60.0,
+    },
+    'process-webhook-events': {
+        'task': 'payments.tasks.process_webhook_events',
+        'schedule': 60.0,
+    },
+    'purge-expired-guest-data': {
+        'task': 'cart.tasks.purge_expired_guest_data',
+        'schedule': 3600.0,
+    },
 }
\ No newline at end of file
@@ -4,18 +4,28 @@ from django.contrib import admin
 from django.urls import include, path
 from django.views.generic import RedirectView
 from django.views.i18n import set_language
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
+from django.middleware.csrf import get_token
+from django.views.decorators.cache import never_cache
+
+from catalog.api import router as catalog_api
 
 def healthz_view(_):
     # Никакой логики/редиректов, всегда 200 OK
     return HttpResponse("ok", content_type="text/plain", status=200)
 
+@never_cache
+def csrf_token_view(request):
+    # Токен для общих страниц из кэша (catalog.conditional): ставит CSRF-cookie
+    return JsonResponse({"token": get_token(request)})
+
 urlpatterns = [
     # Технические и служебные пути
     path("healthz", healthz_view, name="healthz"),
     path("healthz/", healthz_view),
     path("admin/", admin.site.urls),
     path("i18n/setlang/", set_language, name="set_language"),
+    path("csrf/", csrf_token_view, name="csrf_token"),
 
     # Основные приложения
     path("cms/", include(("cms.urls", "cms"), namespace="cms")),
@@ -24,6 +34,7 @@ urlpatterns = [
     path("orders/", include(("orders.urls", "orders"), namespace="orders")),
     path("payments/", include(("payments.urls", "payments"), namespace="payments")),
     path("users/", include(("users.urls", "users"), namespace="users")),
+    path("api/v1/", include((catalog_api.urls, "api"), namespace="api-v1")),
     path("accounts/", include("django.contrib.auth.urls")),
 
     # Главная страница — редирект на каталог
@@ -1,20 +1,65 @@
-from django.contrib import admin
-from .models import Order, OrderItem, Coupon
+from django.contrib import admin, messages
+from django.utils.translation import gettext_lazy as _
+from . import state
+from .models import Order, OrderItem, Coupon, OutboxMessage, StockReservation
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
     readonly_fields = ("product", "title_snapshot", "qty", "unit_price_snapshot")
 
+class StockReservationInline(admin.TabularInline):
+    model = StockReservation
+    extra = 0
+    can_delete = False
+    readonly_fields = ("product", "qty", "expires_at", "released_at")
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ("id", "status", "customer_name", "email", "total", "discount_total", "shipping_total", "currency", "placed_at", "created_at")
     list_filter = ("status", "currency", "created_at")
     search_fields = ("id", "email", "phone", "customer_name", "tracking_number")
-    inlines = [OrderItemInline]
+    inlines = [OrderItemInline, StockReservationInline]
+    actions = ("mark_processing", "mark_shipped", "mark_delivered", "mark_cancelled")
+
+    def _bulk_transition(self, request, queryset, target):
+        # условные UPDATE кусками; заказы в неподходящем статусе просто пропускаются
+        ids = list(queryset.order_by().values_list("pk", flat=True))
+        moved = state.bulk_transition(ids, target)
+        self.message_user(request, f"{len(moved)} order(s) moved to \"{target.label}\".", messages.SUCCESS)
+        if len(moved) < len(ids):
+            self.message_user(
+                request, f"{len(ids) - len(moved)} order(s) skipped: status does not allow this transition.",
+                messages.WARNING,
+            )
+
+    @admin.action(description=_("Mark as processing"))
+    def mark_processing(self, request, queryset):
+        self._bulk_transition(request, queryset, Order.Status.PROCESSING)
+
+    @admin.action(description=_("Mark as shipped"))
+    def mark_shipped(self, request, queryset):
+        self._bulk_transition(request, queryset, Order.Status.SHIPPED)
+
+    @admin.action(description=_("Mark as delivered"))
+    def mark_delivered(self, request, queryset):
+        self._bulk_transition(request, queryset, Order.Status.DELIVERED)
+
+    @admin.action(description=_("Cancel unpaid orders"))
+    def mark_cancelled(self, request, queryset):
+        self._bulk_transition(request, queryset, Order.Status.CANCELLED)
 
 @admin.register(Coupon)
 class CouponAdmin(admin.ModelAdmin):
-    list_display = ("code", "type", "value", "min_total", "starts_at", "ends_at", "is_active", "usage_limit_total", "usage_limit_per_user", "stackable")
+    list_display = ("code", "type", "value", "min_total", "starts_at", "ends_at", "is_active", "usage_limit_total", "times_used", "usage_limit_per_user", "stackable")
     list_filter = ("type", "is_active")
     search_fields = ("code",)
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ("dedup_key", "status", "attempts", "next_attempt_at", "sent_at", "created_at")
+    list_filter = ("status", "kind")
+    search_fields = ("dedup_key",)
+    raw_id_fields = ("order",)
+    readonly_fields = ("order", "kind", "dedup_key", "attempts", "sent_at", "last_error", "created_at", "updated_at")
@@ -0,0 +1,48 @@
+# orders/claims.py
+"""
+Привязка гостевых заказов к аккаунту.
+
+Гостевой заказ хранит guest_email_normalized (trim + lower) с частичным
+индексом по заказам без пользователя, поэтому поиск — индексный равенством,
+а не iexact-скан всей таблицы. Привязка идёт в фоне после регистрации
+кусками по CHUNK_SIZE: каждый кусок — SELECT id по индексу и условный UPDATE
+(только ещё не привязанные). Смена e-mail в профиле привязку не запускает:
+адрес там не подтверждается, и так можно было бы забрать чужие заказы.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.functions import Now
+
+from config.background import run_after_commit
+from .models import Order
+
+CHUNK_SIZE = 500
+
+
+def normalize_email(email) -> str:
+    return (email or "").strip().lower()
+
+
+def claim_guest_orders(user_id, chunk_size: int = CHUNK_SIZE) -> int:
+    """Привязывает к пользователю гостевые заказы с его текущим e-mail. Возвращает число привязанных."""
+    email = get_user_model().objects.filter(pk=user_id).values_list("email", flat=True).first()
+    email = normalize_email(email)
+    if not email:
+        return 0
+    claimed = 0
+    while True:
+        ids = list(
+            Order.objects.filter(guest_email_normalized=email, user__isnull=True)
+            .order_by().values_list("pk", flat=True)[:chunk_size]
+        )
+        if not ids:
+            return claimed
+        claimed += Order.objects.filter(pk__in=ids, user__isnull=True).update(user_id=user_id, updated_at=Now())
+
+
+def schedule_claim(user) -> None:
+    """После коммита ставит привязку в очередь (без Redis или при недоступном брокере — сразу)."""
+    user_id = user.pk
+    run_after_commit(
+        "GUEST_ORDER_CLAIM_ASYNC", "orders.tasks.claim_guest_orders", user_id,
+        inline=lambda: claim_guest_orders(user_id),
+    )
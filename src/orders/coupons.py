@@ -0,0 +1,79 @@
+# orders/coupons.py
+"""
+Купоны: поиск по коду и учёт использований.
+
+Активные купоны держатся в кэше одним словарём {код в нижнем регистре: Coupon}
+с коротким TTL — поиск без учёта регистра не ходит в БД. Проверка лимитов
+при применении — чтение счётчика Coupon.times_used и одной строки журнала
+CouponRedemption по уникальному индексу (coupon, subject).
+
+Окончательно лимиты соблюдаются в redeem(): оба счётчика увеличиваются
+условными UPDATE внутри транзакции заказа, и при превышении заказ
+откатывается целиком.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Coupon, CouponRedemption
+
+ACTIVE_COUPONS_KEY = "orders:coupons:active"
+ACTIVE_COUPONS_TTL = 60
+
+
+class CouponUnavailable(Exception):
+    """Купон нельзя использовать: истёк, выключен или исчерпан лимит."""
+
+
+def subject_for(user, email: str) -> str:
+    """Кому засчитывается использование: пользователю или email гостя."""
+    if user is not None and getattr(user, "is_authenticated", False):
+        return f"u:{user.pk}"
+    return f"e:{(email or '').strip().lower()}"
+
+
+def active_coupons() -> dict:
+    coupons = cache.get(ACTIVE_COUPONS_KEY)
+    if coupons is None:
+        coupons = {
+            c.code.lower(): c
+            for c in Coupon.objects.filter(is_active=True, ends_at__gte=timezone.now())
+        }
+        cache.set(ACTIVE_COUPONS_KEY, coupons, getattr(settings, "ACTIVE_COUPONS_TTL", ACTIVE_COUPONS_TTL))
+    return coupons
+
+
+def invalidate_active_coupons() -> None:
+    cache.delete(ACTIVE_COUPONS_KEY)
+
+
+def find_coupon(code: str):
+    """Активный купон по коду без учёта регистра или None."""
+    return active_coupons().get((code or "").strip().lower())
+
+
+def uses_by(coupon, subject: str) -> int:
+    return CouponRedemption.objects.filter(coupon=coupon, subject=subject).values_list("uses", flat=True).first() or 0
+
+
+def redeem(coupon, subject: str) -> None:
+    """
+    Засчитывает использование купона. Вызывать внутри transaction.atomic()
+    вместе с созданием заказа: при превышении лимита бросает CouponUnavailable.
+    """
+    now = timezone.now()
+    updated = Coupon.objects.filter(
+        Q(usage_limit_total__isnull=True) | Q(times_used__lt=F("usage_limit_total")),
+        pk=coupon.pk, is_active=True, starts_at__lte=now, ends_at__gte=now,
+    ).update(times_used=F("times_used") + 1)
+    if not updated:
+        raise CouponUnavailable("The promocode has expired or its usage limit has been reached.")
+
+    CouponRedemption.objects.bulk_create([CouponRedemption(coupon=coupon, subject=subject)], ignore_conflicts=True)
+    updated = CouponRedemption.objects.filter(
+        Q(coupon__usage_limit_per_user__isnull=True) | Q(uses__lt=F("coupon__usage_limit_per_user")),
+        coupon=coupon, subject=subject,
+    ).update(uses=F("uses") + 1)
+    if not updated:
+        raise CouponUnavailable("You have already used this promocode as many times as possible.")
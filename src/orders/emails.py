@@ -1,13 +1,12 @@
 # orders/emails.py
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
-from django.utils.translation import gettext as _
 from django.conf import settings
 
 
-def send_order_email(order, template_name, subject):
+def build_order_email(order, template_name, subject, connection=None) -> EmailMultiAlternatives:
     """
-    Универсальная функция для отправки HTML-писем
+    Собирает HTML-письмо по заказу (без отправки)
     """
     context = {
         'order': order,
@@ -22,7 +21,8 @@ def send_order_email(order, template_name, subject):
         subject=subject,
         body=text_content,
         from_email=settings.DEFAULT_FROM_EMAIL,
-        to=[order.email]
+        to=[order.email],
+        connection=connection,
     )
     msg.attach_alternative(html_content, "text/html")
-    msg.send()
\ No newline at end of file
+    return msg
@@ -0,0 +1,78 @@
+# orders/history.py
+"""
+История заказов покупателя для личного кабинета.
+
+Страницы — keyset по (created_at, id) от новых к старым: курсор «before»
+указывает на последний показанный заказ, и следующая страница читается тем
+же индексом (user, -created_at, -id) без OFFSET, сколько бы заказов ни было.
+Число позиций, первая позиция и её фото добавляются подзапросами в тот же
+SELECT — по запросу на заказ больше не ходим.
+
+stamp() — дешёвая «версия» заказов пользователя (их число и последний
+updated_at по индексу (user, updated_at)); по ней кэшируется отрисованная
+вкладка: новый заказ или смена статуса меняют stamp.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Count, IntegerField, Max, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from catalog.models import ProductImage
+from .models import Order, OrderItem
+
+PAGE_SIZE = 20
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def encode_cursor(order) -> str:
+    micros = (order.created_at - _EPOCH) // timedelta(microseconds=1)
+    return f"{micros}-{order.pk}"
+
+
+def decode_cursor(value):
+    """'<микросекунды>-<id>' -> (created_at, id); мусор -> None (первая страница)."""
+    micros, _, pk = (value or "").partition("-")
+    if not (micros.isdigit() and pk.isdigit()):
+        return None
+    return _EPOCH + timedelta(microseconds=int(micros)), int(pk)
+
+
+def with_summary(qs):
+    """Аннотирует заказы: items_qty, first_title, first_image и его variants/placeholder."""
+    items = OrderItem.objects.filter(order=OuterRef("pk")).order_by("id")
+    qty = (
+        OrderItem.objects.filter(order=OuterRef("pk")).order_by()
+        .values("order").annotate(s=Sum("qty")).values("s")
+    )
+    images = ProductImage.objects.filter(product=OuterRef("first_product")).order_by("position", "id")
+    return qs.annotate(
+        items_qty=Coalesce(Subquery(qty, output_field=IntegerField()), 0),
+        first_title=Subquery(items.values("title_snapshot")[:1]),
+        first_product=Subquery(items.values("product_id")[:1]),
+    ).annotate(
+        first_image=Subquery(images.values("file")[:1]),
+        first_image_variants=Subquery(images.values("variants")[:1]),
+        first_image_placeholder=Subquery(images.values("placeholder")[:1]),
+    )
+
+
+def page(user, before=None, size: int = PAGE_SIZE):
+    """
+    Страница заказов пользователя старше курсора before.
+    Возвращает (orders, next_cursor); next_cursor None — это последняя страница.
+    """
+    qs = Order.objects.filter(user=user)
+    cursor = decode_cursor(before)
+    if cursor:
+        created_at, pk = cursor
+        qs = qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+    orders = list(with_summary(qs.order_by("-created_at", "-id"))[:size + 1])
+    if len(orders) > size:
+        return orders[:size], encode_cursor(orders[size - 1])
+    return orders, None
+
+
+def stamp(user) -> str:
+    agg = Order.objects.filter(user=user).order_by().aggregate(n=Count("*"), last=Max("updated_at"))
+    last = agg["last"]
+    return f"{agg['n']}.{last.timestamp() if last else 0}"
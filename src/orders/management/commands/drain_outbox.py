@@ -0,0 +1,11 @@
+from config.background import BatchCommand
+from orders.outbox import DRAIN_BATCH, drain
+
+
+class Command(BatchCommand):
+    help = "Отправляет накопившиеся письма из outbox (для запуска по cron без Celery Beat)."
+    batch_size = DRAIN_BATCH
+    result_label = "Sent"
+
+    def run(self, batch_size: int) -> int:
+        return drain(batch_size=batch_size)
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:19
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0005_productimage_variants'),
+        ('orders', '0002_order_delivery_method'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='guest_email',
+            field=models.EmailField(blank=True, max_length=254, null=True),
+        ),
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('qty', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1)])),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='orders.order')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='catalog.product')),
+            ],
+            options={
+                'verbose_name': 'Stock reservation',
+                'verbose_name_plural': 'Stock reservations',
+                'constraints': [models.UniqueConstraint(fields=('order', 'product'), name='uniq_reservation_order_product')],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_usage(apps, schema_editor):
+    """Счётчики и журнал использований по уже оформленным заказам."""
+    Coupon = apps.get_model("orders", "Coupon")
+    CouponRedemption = apps.get_model("orders", "CouponRedemption")
+    Order = apps.get_model("orders", "Order")
+    used = Order.objects.filter(coupon__isnull=False)
+    for row in used.values("coupon_id").annotate(n=Count("id")):
+        Coupon.objects.filter(pk=row["coupon_id"]).update(times_used=row["n"])
+
+    per_subject = {}
+    for row in used.values("coupon_id", "user_id", "email").annotate(n=Count("id")):
+        if row["user_id"] is not None:
+            subject = f"u:{row['user_id']}"
+        else:
+            subject = f"e:{(row['email'] or '').strip().lower()}"
+        key = (row["coupon_id"], subject)
+        per_subject[key] = per_subject.get(key, 0) + row["n"]
+    CouponRedemption.objects.bulk_create(
+        [CouponRedemption(coupon_id=coupon_id, subject=subject, uses=n) for (coupon_id, subject), n in per_subject.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_stock_reservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coupon',
+            name='times_used',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='CouponRedemption',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=270)),
+                ('uses', models.PositiveIntegerField(default=0)),
+                ('coupon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='redemptions', to='orders.coupon')),
+            ],
+            options={
+                'verbose_name': 'Coupon redemption',
+                'verbose_name_plural': 'Coupon redemptions',
+                'constraints': [models.UniqueConstraint(fields=('coupon', 'subject'), name='uniq_coupon_redemption_subject')],
+            },
+        ),
+        migrations.RunPython(backfill_usage, migrations.RunPython.noop),
+    ]
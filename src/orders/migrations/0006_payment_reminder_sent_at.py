@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_outbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='payment_reminder_sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('payment_reminder_sent_at__isnull', True), ('status', 'pending')), fields=['created_at'], name='order_reminder_due_idx'),
+        ),
+    ]
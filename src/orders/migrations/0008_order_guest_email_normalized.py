@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:38
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Lower, Trim
+
+
+def backfill_normalized(apps, schema_editor):
+    """Нормализованный e-mail для уже оформленных гостевых заказов — одним UPDATE."""
+    Order = apps.get_model("orders", "Order")
+    Order.objects.filter(guest_email__isnull=False).update(guest_email_normalized=Lower(Trim("guest_email")))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_order_history_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='guest_email_normalized',
+            field=models.CharField(blank=True, default='', editable=False, max_length=254),
+        ),
+        migrations.RunPython(backfill_normalized, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('user__isnull', True)), fields=['guest_email_normalized'], name='order_guest_email_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_order_guest_email_normalized'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockreservation',
+            name='released_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -27,6 +27,8 @@ class Coupon(TimeStamped):
     usage_limit_per_user = models.PositiveIntegerField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
     stackable = models.BooleanField(default=False)
+    # Счётчик использований; меняется только условным UPDATE (orders.coupons.redeem)
+    times_used = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         verbose_name = _("Coupon")
@@ -40,6 +42,22 @@ class Coupon(TimeStamped):
         now = timezone.now()
         return self.is_active and self.starts_at <= now <= self.ends_at
 
+class CouponRedemption(models.Model):
+    """Использования купона одним покупателем: subject — "u:<id>" или "e:<email>"."""
+    coupon = models.ForeignKey(Coupon, on_delete=models.CASCADE, related_name="redemptions")
+    subject = models.CharField(max_length=270)
+    uses = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = _("Coupon redemption")
+        verbose_name_plural = _("Coupon redemptions")
+        constraints = [
+            models.UniqueConstraint(fields=["coupon", "subject"], name="uniq_coupon_redemption_subject"),
+        ]
+
+    def __str__(self):
+        return f"{self.coupon} / {self.subject}: {self.uses}"
+
 class Order(TimeStamped):
     class Status(models.TextChoices):
         DRAFT = "draft", _("Draft")
@@ -85,11 +103,29 @@ class Order(TimeStamped):
         blank=True,
         null=True
     )
+    # guest_email в trim+lower — индексный поиск при привязке к аккаунту (orders.claims)
+    guest_email_normalized = models.CharField(max_length=254, blank=True, default="", editable=False)
+    # Когда ушло напоминание об оплате (orders.reminders); одно на заказ
+    payment_reminder_sent_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         verbose_name = _("Order")
         verbose_name_plural = _("Orders")
         ordering = ["-created_at"]
+        indexes = [
+            # выборка заказов, ждущих напоминания
+            models.Index(
+                fields=["created_at"], name="order_reminder_due_idx",
+                condition=models.Q(status="pending", payment_reminder_sent_at__isnull=True),
+            ),
+            # история в личном кабинете: keyset-страницы и «версия» заказов (orders.history)
+            models.Index(fields=["user", "-created_at", "-id"], name="order_user_history_idx"),
+            models.Index(fields=["user", "updated_at"], name="order_user_updated_idx"),
+            models.Index(
+                fields=["guest_email_normalized"], name="order_guest_email_idx",
+                condition=models.Q(user__isnull=True),
+            ),
+        ]
 
     def __str__(self):
         return f"Order #{self.pk} - {self.status}"
@@ -107,3 +143,53 @@ class OrderItem(TimeStamped):
 
     def line_total(self):
         return self.unit_price_snapshot * self.qty
+
+
+class StockReservation(TimeStamped):
+    """
+    Товар, списанный со склада под неоплаченный заказ. Если заказ не оплачен
+    до expires_at, orders.tasks.release_expired_reservations вернёт остаток на
+    склад и отметит released_at — сам заказ остаётся неоплаченным. При оплате
+    резерв удаляется, а отпущенный товар списывается заново.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    qty = models.PositiveIntegerField(validators=[MinValueValidator(1)])
+    expires_at = models.DateTimeField(db_index=True)
+    released_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Stock reservation")
+        verbose_name_plural = _("Stock reservations")
+        constraints = [
+            models.UniqueConstraint(fields=["order", "product"], name="uniq_reservation_order_product"),
+        ]
+
+
+class OutboxMessage(TimeStamped):
+    """
+    Письмо по заказу, записанное в транзакции заказа. Отправляет воркер после
+    коммита (orders.outbox); dedup_key не даёт поставить одно письмо дважды.
+    """
+    class Status(models.TextChoices):
+        PENDING = "pending", _("Pending")
+        SENDING = "sending", _("Sending")
+        SENT = "sent", _("Sent")
+        FAILED = "failed", _("Failed")
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="outbox_messages")
+    kind = models.CharField(max_length=32)
+    dedup_key = models.CharField(max_length=64, unique=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = _("Outbox message")
+        verbose_name_plural = _("Outbox messages")
+        indexes = [models.Index(fields=["status", "next_attempt_at"])]
+
+    def __str__(self):
+        return self.dedup_key
@@ -0,0 +1,117 @@
+# orders/outbox.py
+"""
+Транзакционный outbox писем по заказам.
+
+enqueue() пишет OutboxMessage в той же транзакции, что и заказ/оплата, и после
+коммита ставит задачу отправки. Запрос не ждёт ни шаблонов, ни SMTP, а если
+брокер недоступен, письма этой транзакции уходят сразу (config.background).
+Без Celery (OUTBOX_ASYNC выключен) после коммита тоже уходят лишь
+письма этой транзакции; повторы и накопившееся отправляет drain() из Beat
+или команда drain_outbox по cron. Отправка идемпотентна: сообщение сначала захватывается условным
+UPDATE (pending → sending), отправленное повторно не уходит. Ошибки —
+повтор с экспоненциальной задержкой, после MAX_ATTEMPTS — статус failed.
+"""
+import logging
+from datetime import timedelta
+
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from config.background import run_after_commit
+from .emails import build_order_email
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 8
+BASE_DELAY = 60          # секунд до первого повтора, дальше удваивается
+MAX_DELAY = 6 * 3600
+STALE_SENDING = timedelta(minutes=15)
+DRAIN_BATCH = 100
+
+# kind -> (шаблон, тема)
+KINDS = {
+    "order_created": ("order_created", lambda: _("Ваш заказ принят")),
+    "order_paid": ("order_paid", lambda: _("Заказ оплачен")),
+    "order_shipped": ("order_shipped", lambda: _("Заказ отправлен")),
+    "order_delivered": ("order_delivered", lambda: _("Заказ доставлен")),
+}
+
+
+def enqueue(order, kind: str) -> None:
+    """
+    Ставит письмо kind по заказу. Вызывать внутри транзакции, меняющей заказ:
+    письмо появится, только если она закоммитится. Повторный вызов — no-op.
+    """
+    enqueue_many([order.pk], kind)
+
+
+def enqueue_many(order_ids, kind: str, inline: bool = True) -> None:
+    """
+    То же для пачки заказов: один INSERT и одна постановка задачи.
+    inline=False — без Celery письма не отправляются в запросе, их заберёт drain().
+    """
+    keys = [f"{kind}:{order_id}" for order_id in order_ids]
+    OutboxMessage.objects.bulk_create(
+        [OutboxMessage(order_id=order_id, kind=kind, dedup_key=key) for order_id, key in zip(order_ids, keys)],
+        ignore_conflicts=True,
+    )
+    run_after_commit(
+        "OUTBOX_ASYNC", "orders.tasks.drain_outbox",
+        inline=(lambda: _deliver_keys(keys)) if inline else None,
+    )
+
+
+def _deliver_keys(keys) -> None:
+    # в запросе — только свои письма, очередь целиком запрос не разбирает
+    for message_id in OutboxMessage.objects.filter(dedup_key__in=keys).values_list("pk", flat=True):
+        deliver(message_id)
+
+
+def backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(BASE_DELAY * 2 ** max(attempts - 1, 0), MAX_DELAY))
+
+
+def deliver(message_id: int) -> bool:
+    """Отправляет одно сообщение, если удалось его захватить. True — отправлено."""
+    now = timezone.now()
+    claimed = OutboxMessage.objects.filter(
+        Q(status=OutboxMessage.Status.PENDING, next_attempt_at__lte=now)
+        | Q(status=OutboxMessage.Status.SENDING, updated_at__lt=now - STALE_SENDING),
+        pk=message_id,
+    ).update(status=OutboxMessage.Status.SENDING, attempts=F("attempts") + 1, updated_at=now)
+    if not claimed:
+        return False
+
+    message = OutboxMessage.objects.select_related("order").get(pk=message_id)
+    try:
+        template_name, subject = KINDS[message.kind]
+        build_order_email(message.order, template_name, f"{subject()} #{message.order_id}").send()
+    except Exception as exc:
+        failed = message.attempts >= MAX_ATTEMPTS
+        OutboxMessage.objects.filter(pk=message_id).update(
+            status=OutboxMessage.Status.FAILED if failed else OutboxMessage.Status.PENDING,
+            next_attempt_at=timezone.now() + backoff(message.attempts),
+            last_error=repr(exc)[:2000],
+            updated_at=timezone.now(),
+        )
+        logger.warning("Outbox: %s attempt %s failed", message.dedup_key, message.attempts, exc_info=True)
+        return False
+
+    OutboxMessage.objects.filter(pk=message_id).update(
+        status=OutboxMessage.Status.SENT, sent_at=timezone.now(), last_error="", updated_at=timezone.now(),
+    )
+    return True
+
+
+def drain(batch_size: int = DRAIN_BATCH) -> int:
+    """Отправляет готовые к отправке сообщения (и зависшие в sending). Возвращает число отправленных."""
+    now = timezone.now()
+    ids = list(
+        OutboxMessage.objects.filter(
+            Q(status=OutboxMessage.Status.PENDING, next_attempt_at__lte=now)
+            | Q(status=OutboxMessage.Status.SENDING, updated_at__lt=now - STALE_SENDING)
+        ).order_by("next_attempt_at").values_list("pk", flat=True)[:batch_size]
+    )
+    return sum(1 for message_id in ids if deliver(message_id))
@@ -0,0 +1,89 @@
+# orders/reminders.py
+"""
+Напоминания об оплате.
+
+Заказы в окне 24–48 ч после создания без payment_reminder_sent_at читаются
+через .iterator() пачками. Каждая пачка сначала помечается условным UPDATE
+(только ещё не напомненные и всё ещё PENDING), затем письма помеченным
+заказам уходят одним send_messages() по одному SMTP-соединению. Если
+отправка пачки упала, пометка снимается — заказы попадут в следующий запуск.
+
+От параллельного запуска (два Beat) защищает блокировка cache.add.
+"""
+import logging
+import uuid
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.mail import get_connection
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from .emails import build_order_email
+from .models import Order
+
+logger = logging.getLogger(__name__)
+
+LOCK_KEY = "orders:payment-reminders:lock"
+LOCK_TIMEOUT = 30 * 60
+BATCH_SIZE = 100
+REMIND_AFTER = timedelta(hours=24)
+REMIND_UNTIL = timedelta(hours=48)
+
+
+def _due(now):
+    return Order.objects.filter(
+        status=Order.Status.PENDING,
+        payment_reminder_sent_at__isnull=True,
+        created_at__lte=now - REMIND_AFTER,
+        created_at__gte=now - REMIND_UNTIL,
+    ).order_by()
+
+
+def _send_batch(orders, now) -> int:
+    ids = [order.pk for order in orders]
+    Order.objects.filter(
+        pk__in=ids, status=Order.Status.PENDING, payment_reminder_sent_at__isnull=True,
+    ).update(payment_reminder_sent_at=now)
+    # письма только тем, кого пометил этот запуск
+    claimed = set(Order.objects.filter(pk__in=ids, payment_reminder_sent_at=now).values_list("pk", flat=True))
+    orders = [order for order in orders if order.pk in claimed]
+    if not orders:
+        return 0
+
+    subject = _("Напоминание об оплате")
+    connection = get_connection()
+    try:
+        messages = [
+            build_order_email(order, "payment_reminder", f"{subject} #{order.pk}", connection=connection)
+            for order in orders
+        ]
+        sent = connection.send_messages(messages) or 0
+    except Exception:
+        logger.warning("Payment reminders: batch of %s failed, will retry", len(orders), exc_info=True)
+        Order.objects.filter(pk__in=claimed, payment_reminder_sent_at=now).update(payment_reminder_sent_at=None)
+        return 0
+    return sent
+
+
+def send_payment_reminders(now=None, batch_size: int = BATCH_SIZE):
+    """Рассылает напоминания; возвращает число отправленных писем (None — уже идёт другой запуск)."""
+    token = uuid.uuid4().hex
+    if not cache.add(LOCK_KEY, token, LOCK_TIMEOUT):
+        logger.info("Payment reminders: another run holds the lock")
+        return None
+    try:
+        now = now or timezone.now()
+        qs = _due(now).only("id", "email", "total", "currency", "status")
+        sent, batch = 0, []
+        for order in qs.iterator(chunk_size=batch_size):
+            batch.append(order)
+            if len(batch) >= batch_size:
+                sent += _send_batch(batch, now)
+                batch = []
+        if batch:
+            sent += _send_batch(batch, now)
+        return sent
+    finally:
+        if cache.get(LOCK_KEY) == token:
+            cache.delete(LOCK_KEY)
@@ -0,0 +1,68 @@
+# orders/services.py
+from django.db import transaction
+from django.utils import timezone
+
+from catalog.translations import prefetch_translations
+from . import claims, coupons, outbox, stock
+from .models import Order, OrderItem
+
+
+def _title_snapshot(product) -> str:
+    return product.safe_translation_getter("title", any_language=True) or str(product)
+
+
+def place_order(form, cart, items, *, user=None, coupon=None, total, discount_total, shipping_total):
+    """
+    Создаёт заказ из корзины за фиксированное число запросов, независимо от
+    числа позиций: INSERT заказа, один bulk_create позиций, один UPDATE остатков
+    (+ INSERT резервов), очистка корзины. Заголовки для title_snapshot берутся
+    одним запросом переводов (или из уже загруженных).
+
+    cart — хранилище корзины (cart.backends), items — её позиции с товарами.
+    При нехватке остатка бросает stock.OutOfStock, при исчерпанном купоне —
+    coupons.CouponUnavailable; транзакция откатывается целиком.
+    """
+    prefetch_translations(it.product for it in items)
+    lines = [
+        OrderItem(
+            product=it.product,
+            title_snapshot=_title_snapshot(it.product)[:200],
+            qty=it.qty,
+            unit_price_snapshot=it.unit_price_snapshot,
+        )
+        for it in items
+    ]
+
+    with transaction.atomic():
+        # ВАЖНО: адреса и способ доставки уже соберутся в save() формы
+        order = form.save(commit=False)
+        if user is not None and user.is_authenticated:
+            order.user = user
+        else:
+            order.guest_email = form.cleaned_data["email"]
+            order.guest_email_normalized = claims.normalize_email(order.guest_email)
+        order.status = Order.Status.PENDING
+        order.total = total
+        order.discount_total = discount_total
+        order.shipping_total = shipping_total
+        order.currency = "GEL"
+        order.coupon = coupon
+        order.placed_at = timezone.now()
+        order.save()
+
+        if coupon is not None:
+            # лимиты купона — условными UPDATE счётчиков; превышен — откат заказа
+            coupons.redeem(coupon, coupons.subject_for(user, order.email))
+
+        for line in lines:
+            line.order = order
+        OrderItem.objects.bulk_create(lines)
+
+        # списываем остатки всех позиций одним UPDATE; не хватило — откат всего заказа
+        stock.reserve(order, [(it.product_id, it.qty) for it in items])
+
+        cart.clear()
+
+        # письмо уйдёт из outbox после коммита, запрос SMTP не ждёт
+        outbox.enqueue(order, "order_created")
+    return order
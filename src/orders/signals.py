@@ -0,0 +1,14 @@
+# orders/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import coupons
+from .models import Coupon
+
+
+@receiver(post_save, sender=Coupon, dispatch_uid="orders.coupon.saved")
+@receiver(post_delete, sender=Coupon, dispatch_uid="orders.coupon.deleted")
+def _coupon_changed(sender, **kwargs):
+    # redeem() меняет times_used через UPDATE без сигналов — кэш не трогается
+    transaction.on_commit(coupons.invalidate_active_coupons)
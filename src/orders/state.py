@@ -0,0 +1,96 @@
+# orders/state.py
+"""
+Переходы статусов заказа.
+
+Каждый переход — один условный UPDATE ... WHERE status IN (допустимые
+источники): из двух параллельных попыток (вебхук и оплата в браузере,
+два админа) статус меняет ровно одна, она же выполняет побочные эффекты
+(резервы, письма). Проигравшая получает False и ничего не делает.
+
+Пачки (админские действия) двигаются кусками по CHUNK_SIZE: UPDATE куска,
+затем SELECT выигравших по отметке updated_at этого прохода, затем один
+INSERT писем в outbox на весь кусок. Письма пачки в запросе не отправляются
+даже без Celery — их разбирает drain() (Beat или команда drain_outbox).
+"""
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce, Now
+from django.utils import timezone
+
+from . import outbox, stock
+from .models import Order
+
+CHUNK_SIZE = 500
+
+S = Order.Status
+
+# целевой статус -> из каких можно в него перейти
+SOURCES = {
+    # PROCESSING идёт после оплаты (заказ в работе), поэтому оплатить можно только
+    # PENDING; раньше pay_page принимал и PROCESSING — такие заказы уже оплачены
+    S.PAID: (S.PENDING,),
+    S.PROCESSING: (S.PAID,),
+    S.SHIPPED: (S.PAID, S.PROCESSING),
+    S.DELIVERED: (S.SHIPPED,),
+    # отменяются только неоплаченные: их резерв возвращается на склад
+    S.CANCELLED: (S.DRAFT, S.PENDING),
+}
+
+# письмо покупателю о переходе (вид сообщения в orders.outbox)
+NOTIFY = {
+    S.PAID: "order_paid",
+    S.SHIPPED: "order_shipped",
+    S.DELIVERED: "order_delivered",
+}
+
+
+def can_transition(order, target) -> bool:
+    return order.status in SOURCES.get(target, ())
+
+
+def _fields(target, now) -> dict:
+    fields = {"status": target, "updated_at": now}
+    if target == S.PAID:
+        fields["placed_at"] = Coalesce(F("placed_at"), Now())
+    return fields
+
+
+def _after(target, order_ids, inline: bool = True) -> None:
+    """Побочные эффекты перехода для выигравших заказов (внутри той же транзакции)."""
+    if target == S.PAID:
+        stock.confirm_many(order_ids)
+    elif target == S.CANCELLED:
+        stock.release_many(order_ids)
+    if target in NOTIFY:
+        outbox.enqueue_many(order_ids, NOTIFY[target], inline=inline)
+
+
+def transition(order, target) -> bool:
+    """Переводит заказ в target, если он в допустимом статусе. True — переход выполнил этот вызов."""
+    now = timezone.now()
+    with transaction.atomic():
+        moved = Order.objects.filter(pk=order.pk, status__in=SOURCES[target]).update(**_fields(target, now))
+        if not moved:
+            return False
+        _after(target, [order.pk])
+    order.status = target
+    order.updated_at = now
+    return True
+
+
+def bulk_transition(order_ids, target, chunk_size: int = CHUNK_SIZE) -> list:
+    """Переводит пачку заказов; возвращает id тех, что перешли (остальные были в другом статусе)."""
+    order_ids = list(order_ids)
+    moved = []
+    for start in range(0, len(order_ids), chunk_size):
+        chunk = order_ids[start:start + chunk_size]
+        now = timezone.now()
+        with transaction.atomic():
+            Order.objects.filter(pk__in=chunk, status__in=SOURCES[target]).update(**_fields(target, now))
+            won = list(
+                Order.objects.filter(pk__in=chunk, status=target, updated_at=now).values_list("pk", flat=True)
+            )
+            if won:
+                _after(target, won, inline=False)
+        moved += won
+    return moved
@@ -0,0 +1,202 @@
+# orders/stock.py
+"""
+Списание и возврат остатков.
+
+Все строки заказа списываются одним условным UPDATE: каждая строка
+уменьшается только если in_stock >= qty, и число обновлённых строк сверяется
+с числом товаров. Не хватило хотя бы одного — OutOfStock, и вызывающий
+transaction.atomic() откатывает заказ целиком. Строки блокируются только на
+время этого UPDATE, без SELECT ... FOR UPDATE.
+
+Списанное под неоплаченный заказ записывается в StockReservation со сроком
+STOCK_RESERVATION_TTL; просроченные резервы возвращает на склад Celery-задача.
+Заказ при этом не отменяется: резерв помечается released_at, а при оплате
+отпущенный товар списывается заново (не хватило — OutOfStock, оплата не проходит).
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, When
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from catalog.fragments import bump_catalog_version
+from catalog.models import Product
+from .models import Order, StockReservation
+
+UNPAID = (Order.Status.DRAFT, Order.Status.PENDING)
+
+RELEASE_BATCH = 200
+
+
+class _Shortfall(Exception):
+    pass
+
+
+class OutOfStock(Exception):
+    """Не хватает остатка; shortages — {product_id: доступно}."""
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__(f"Not enough stock for products: {sorted(shortages)}")
+
+
+def reservation_ttl() -> timedelta:
+    return getattr(settings, "STOCK_RESERVATION_TTL", timedelta(minutes=30))
+
+
+def _merge_lines(lines) -> dict:
+    """(product_id, qty) -> {product_id: qty}, одинаковые товары складываются."""
+    merged = defaultdict(int)
+    for product_id, qty in lines:
+        merged[product_id] += qty
+    return dict(merged)
+
+
+def _stock_changed(changes: dict, returned: bool = False) -> None:
+    """
+    После коммита поднимает версию каталога (кэш фрагментов и фасетный индекс),
+    если товар закончился или снова появился в наличии — остальные изменения
+    остатка на витрину не влияют.
+    """
+    def refresh():
+        stock = dict(Product.objects.filter(id__in=changes).values_list("id", "in_stock"))
+        if returned:
+            crossed = any(stock.get(pk) == qty for pk, qty in changes.items())
+        else:
+            crossed = any(stock.get(pk) == 0 for pk in changes)
+        if crossed:
+            bump_catalog_version()
+
+    transaction.on_commit(refresh)
+
+
+def decrement(lines) -> dict:
+    """
+    Списывает остатки одним UPDATE. lines — пары (product_id, qty).
+    Вызывать внутри transaction.atomic(): при нехватке бросает OutOfStock,
+    и заказ откатывается вместе с транзакцией.
+    """
+    wanted = _merge_lines(lines)
+    if not wanted:
+        return wanted
+    enough = Q()
+    for product_id, qty in wanted.items():
+        enough |= Q(id=product_id, in_stock__gte=qty)
+    try:
+        # savepoint: при нехватке частичное списание откатывается сразу,
+        # и в OutOfStock попадают настоящие остатки
+        with transaction.atomic():
+            updated = Product.objects.filter(enough).update(
+                in_stock=Case(
+                    *[When(id=product_id, then=F("in_stock") - qty) for product_id, qty in wanted.items()],
+                    output_field=IntegerField(),
+                ),
+                updated_at=Now(),
+            )
+            if updated != len(wanted):
+                raise _Shortfall
+    except _Shortfall:
+        available = dict(Product.objects.filter(id__in=wanted).values_list("id", "in_stock"))
+        raise OutOfStock({
+            pk: available.get(pk, 0) for pk, qty in wanted.items() if available.get(pk, 0) < qty
+        })
+    _stock_changed(wanted)
+    return wanted
+
+
+def increment(lines) -> None:
+    """Возвращает остатки на склад одним UPDATE."""
+    restock = _merge_lines(lines)
+    if not restock:
+        return
+    Product.objects.filter(id__in=restock).update(
+        in_stock=Case(
+            *[When(id=product_id, then=F("in_stock") + qty) for product_id, qty in restock.items()],
+            output_field=IntegerField(),
+        ),
+        updated_at=Now(),
+    )
+    _stock_changed(restock, returned=True)
+
+
+def reserve(order, lines, ttl: timedelta = None) -> None:
+    """Списывает остатки под заказ и записывает резервы (один UPDATE + один INSERT)."""
+    wanted = decrement(lines)
+    expires_at = timezone.now() + (ttl or reservation_ttl())
+    StockReservation.objects.bulk_create([
+        StockReservation(order=order, product_id=product_id, qty=qty, expires_at=expires_at)
+        for product_id, qty in wanted.items()
+    ])
+
+
+def confirm(order) -> None:
+    """Заказ оплачен — резерв больше не нужен, списание остаётся."""
+    confirm_many([order.pk])
+
+
+def confirm_many(order_ids) -> None:
+    """
+    Оплата пачки заказов. Отпущенные по сроку резервы списываются заново одним
+    UPDATE — при нехватке OutOfStock откатывает переход в PAID.
+    """
+    lapsed = list(
+        StockReservation.objects.filter(order_id__in=order_ids, released_at__isnull=False)
+        .values_list("product_id", "qty")
+    )
+    if lapsed:
+        decrement(lapsed)
+    StockReservation.objects.filter(order_id__in=order_ids).delete()
+
+
+def release(order) -> bool:
+    """Возвращает на склад зарезервированное под заказ. True, если было что возвращать."""
+    return release_many([order.pk])
+
+
+def release_many(order_ids) -> bool:
+    """Возвращает резервы пачки заказов: один SELECT, один UPDATE остатков, один DELETE."""
+    with transaction.atomic():
+        reservations = StockReservation.objects.filter(order_id__in=order_ids)
+        # отпущенное по сроку уже на складе — возвращаем только то, что ещё держим
+        lines = list(reservations.filter(released_at__isnull=True).values_list("product_id", "qty"))
+        if lines:
+            increment(lines)
+        deleted, _ = reservations.delete()
+    return bool(deleted)
+
+
+def release_expired(now=None, batch_size: int = RELEASE_BATCH) -> int:
+    """
+    Возвращает на склад просроченные резервы неоплаченных заказов и помечает
+    их released_at; статус заказа не меняется — отменять его или нет, решает
+    магазин. Строка заказа блокируется, так что параллельная оплата либо
+    успевает раньше (резерв просто удаляется), либо ждёт и списывает заново.
+    Возвращает число заказов, чей резерв отпущен.
+    """
+    now = now or timezone.now()
+    order_ids = list(
+        StockReservation.objects.filter(expires_at__lte=now, released_at__isnull=True)
+        .values_list("order_id", flat=True).distinct()[:batch_size]
+    )
+    released = 0
+    for order_id in order_ids:
+        with transaction.atomic():
+            status = (
+                Order.objects.select_for_update().filter(pk=order_id)
+                .values_list("status", flat=True).first()
+            )
+            if status in UNPAID:
+                held = StockReservation.objects.filter(order_id=order_id, released_at__isnull=True)
+                increment(held.values_list("product_id", "qty"))
+                held.update(released_at=now, updated_at=Now())
+                released += 1
+            elif status == Order.Status.CANCELLED:
+                # отменён в обход release(), а остаток так и не вернули
+                release(Order(pk=order_id))
+            else:
+                # заказ уже оплачен или в работе — резерв не нужен, списание остаётся
+                StockReservation.objects.filter(order_id=order_id).delete()
+    return released
@@ -1,3 +1,157 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from catalog.models import Brand, Category, Product
+from orders import coupons, state, stock
+from orders.forms import CheckoutForm
+from orders.models import Coupon, Order, OutboxMessage, StockReservation
+from orders.services import place_order
+
+
+class _Cart:
+    def __init__(self):
+        self.cleared = False
+
+    def clear(self):
+        self.cleared = True
+
+
+class OrderFlowTestCase(TestCase):
+    def setUp(self):
+        category = Category.objects.create(slug="phones")
+        brand = Brand.objects.create(slug="apple", name="Apple")
+        self.products = []
+        for i, in_stock in enumerate((2, 1)):
+            product = Product(
+                category=category, brand=brand, model_name=f"iPhone {i}", base_slug=f"iphone-{i}",
+                storage_gb=128, color="Black", price=Decimal("500"), in_stock=in_stock, sku=f"SKU{i}",
+            )
+            product.set_current_language("en")
+            product.title = f"iPhone {i}"
+            product.save()
+            self.products.append(product)
+
+    def place(self, quantities, email="guest@example.com", coupon=None):
+        form = CheckoutForm({
+            "delivery_method": Order.DELIVERY_PICKUP, "customer_name": "Guest",
+            "email": email, "phone": "+995 555 000", "billing_same": "on",
+        })
+        self.assertTrue(form.is_valid(), form.errors)
+        items = [
+            SimpleNamespace(product=p, product_id=p.pk, qty=qty, unit_price_snapshot=p.price)
+            for p, qty in zip(self.products, quantities) if qty
+        ]
+        return place_order(
+            form, _Cart(), items, coupon=coupon,
+            total=Decimal("500"), discount_total=Decimal("0"), shipping_total=Decimal("0"),
+        )
+
+    def stock_of(self):
+        return [Product.objects.get(pk=p.pk).in_stock for p in self.products]
+
+
+class PlaceOrderTests(OrderFlowTestCase):
+    def test_out_of_stock_rolls_back_whole_order(self):
+        with self.assertRaises(stock.OutOfStock) as ctx:
+            self.place([1, 2])
+        self.assertEqual(ctx.exception.shortages, {self.products[1].pk: 1})
+        self.assertEqual(self.stock_of(), [2, 1])
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(StockReservation.objects.exists())
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_coupon_total_limit_loser_rolls_back(self):
+        now = timezone.now()
+        coupon = Coupon.objects.create(
+            code="ONCE", type=Coupon.Type.FIXED, value=Decimal("10"),
+            starts_at=now - timedelta(days=1), ends_at=now + timedelta(days=1), usage_limit_total=1,
+        )
+        self.place([1, 0], email="first@example.com", coupon=coupon)
+        # второй покупатель прошёл проверку купона по устаревшему счётчику — лимит держит redeem()
+        with self.assertRaises(coupons.CouponUnavailable):
+            self.place([1, 0], email="second@example.com", coupon=coupon)
+        coupon.refresh_from_db()
+        self.assertEqual(coupon.times_used, 1)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(self.stock_of(), [1, 1])
+
+
+class TransitionTests(OrderFlowTestCase):
+    def test_second_payment_loses(self):
+        order = self.place([1, 1])
+        stale = Order.objects.get(pk=order.pk)
+        self.assertTrue(state.transition(order, Order.Status.PAID))
+        self.assertFalse(state.transition(stale, Order.Status.PAID))
+        self.assertEqual(OutboxMessage.objects.filter(order=order, kind="order_paid").count(), 1)
+        self.assertFalse(StockReservation.objects.filter(order=order).exists())
+        self.assertEqual(self.stock_of(), [1, 0])
+
+    def test_cancel_after_payment_loses(self):
+        order = self.place([1, 0])
+        self.assertTrue(state.transition(Order.objects.get(pk=order.pk), Order.Status.PAID))
+        self.assertFalse(state.transition(order, Order.Status.CANCELLED))
+        self.assertEqual(Order.objects.get(pk=order.pk).status, Order.Status.PAID)
+        self.assertEqual(self.stock_of(), [1, 1])
+
+
+@override_settings(OUTBOX_ASYNC=False)
+class OutboxTests(OrderFlowTestCase):
+    def test_inline_delivery_sends_only_own_messages(self):
+        backlog = self.place([1, 0], email="backlog@example.com")
+        with self.captureOnCommitCallbacks(execute=True):
+            order = self.place([0, 1], email="buyer@example.com")
+        self.assertEqual([m.to for m in mail.outbox], [["buyer@example.com"]])
+        self.assertEqual(OutboxMessage.objects.get(order=order).status, OutboxMessage.Status.SENT)
+        self.assertEqual(OutboxMessage.objects.get(order=backlog).status, OutboxMessage.Status.PENDING)
+
+    def test_bulk_transition_leaves_mail_to_drain(self):
+        orders = [self.place([1, 0]) for _ in range(2)]
+        for order in orders:
+            state.transition(order, Order.Status.PAID)
+        with self.captureOnCommitCallbacks(execute=True):
+            moved = state.bulk_transition([o.pk for o in orders], Order.Status.SHIPPED)
+        self.assertEqual(sorted(moved), sorted(o.pk for o in orders))
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(OutboxMessage.objects.filter(kind="order_shipped", status=OutboxMessage.Status.PENDING).count(), 2)
+
+
+class ReservationTests(OrderFlowTestCase):
+    def expire(self):
+        return stock.release_expired(now=timezone.now() + stock.reservation_ttl() + timedelta(seconds=1))
+
+    def test_expired_reservation_returns_stock_but_keeps_order(self):
+        order = self.place([2, 0])
+        self.assertEqual(self.expire(), 1)
+        self.assertEqual(Order.objects.get(pk=order.pk).status, Order.Status.PENDING)
+        self.assertEqual(self.stock_of(), [2, 1])
+        # повторный проход ничего не возвращает второй раз
+        self.assertEqual(self.expire(), 0)
+        self.assertEqual(self.stock_of(), [2, 1])
+
+    def test_payment_after_release_takes_stock_again(self):
+        order = self.place([2, 0])
+        self.expire()
+        self.assertTrue(state.transition(order, Order.Status.PAID))
+        self.assertEqual(self.stock_of(), [0, 1])
+        self.assertFalse(StockReservation.objects.filter(order=order).exists())
+
+    def test_payment_after_release_fails_when_sold_out(self):
+        order = self.place([2, 0])
+        self.expire()
+        self.place([1, 0], email="other@example.com")
+        with self.assertRaises(stock.OutOfStock):
+            state.transition(Order.objects.get(pk=order.pk), Order.Status.PAID)
+        self.assertEqual(Order.objects.get(pk=order.pk).status, Order.Status.PENDING)
+        self.assertEqual(self.stock_of(), [1, 1])
+
+    def test_cancel_after_release_does_not_return_twice(self):
+        order = self.place([2, 0])
+        self.expire()
+        self.assertTrue(state.transition(order, Order.Status.CANCELLED))
+        self.assertEqual(self.stock_of(), [2, 1])
+        self.assertFalse(StockReservation.objects.filter(order=order).exists())
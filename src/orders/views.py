@@ -2,53 +2,46 @@ from decimal import Decimal
 from django.contrib import messages
 from django.http import HttpResponse, HttpResponseBadRequest
 from django.template.loader import render_to_string
-from django.db import transaction
 from django.shortcuts import get_object_or_404, redirect, render
-from django.utils import timezone
-from cart.utils import get_or_create_cart
+from cart.backends import get_cart_backend
+from cart.pricing import get_pricing
+from . import coupons, stock
 from .forms import CheckoutForm
-from .models import Coupon, Order, OrderItem
-# from .tasks import send_order_placed_email
+from .services import place_order
+from .models import Order
 from django.contrib.auth.decorators import login_required
-from .tasks import send_order_created_email
 
 
-def _calc_discount(subtotal: Decimal, coupon: Coupon) -> Decimal:
-    if not coupon:
-        return Decimal("0.00")
-    if coupon.type == Coupon.Type.PERCENT:
-        return (subtotal * coupon.value / Decimal("100")).quantize(Decimal("0.01"))
-    return min(coupon.value, subtotal).quantize(Decimal("0.01"))
-
 def _get_valid_coupon_or_none(code: str, user, email: str, subtotal: Decimal):
     if not code:
         return None, "The promocode is not specified."
-    try:
-        coupon = Coupon.objects.get(code__iexact=code.strip())
-    except Coupon.DoesNotExist:
+    coupon = coupons.find_coupon(code)
+    if coupon is None:
         return None, "The promocode was not found."
     if not coupon.is_valid_now():
         return None, "The promocode has expired or is inactive."
     if subtotal < coupon.min_total:
         return None, f"The minimum amount to apply the promocode: {coupon.min_total}."
-    if coupon.usage_limit_total is not None:
-        used_total = Order.objects.filter(coupon=coupon).count()
-        if used_total >= coupon.usage_limit_total:
-            return None, "The promocode usage limit has been reached."
+    # счётчики здесь только для подсказки; окончательно лимит проверяет coupons.redeem при оформлении
+    if coupon.usage_limit_total is not None and coupon.times_used >= coupon.usage_limit_total:
+        return None, "The promocode usage limit has been reached."
     if coupon.usage_limit_per_user is not None:
-        if user and getattr(user, "is_authenticated", False):
-            used_by_user = Order.objects.filter(coupon=coupon, user=user).count()
-        else:
-            used_by_user = Order.objects.filter(coupon=coupon, email=email).count()
-        if used_by_user >= coupon.usage_limit_per_user:
+        if coupons.uses_by(coupon, coupons.subject_for(user, email)) >= coupon.usage_limit_per_user:
             return None, "You have already used this promocode as many times as possible."
     return coupon, None
 
+def _render_checkout(request, form, pricing):
+    ctx = pricing.as_context()
+    ctx.update({
+        "form": form,
+        "applied_code": request.session.get("applied_coupon_code", "") or "",
+    })
+    return render(request, "orders/checkout.html", ctx)
+
 def checkout(request):
-    cart = get_or_create_cart(request)
-    items = list(cart.items.select_related("product"))
-    subtotal = sum((i.unit_price_snapshot * i.qty for i in items), Decimal("0.00"))
-    shipping_total = Decimal("0.00")
+    # позиции и итоги считаются один раз за запрос (cart.pricing); скидка — от тех же итогов
+    pricing = get_pricing(request)
+    subtotal = pricing.subtotal
 
     # применённый купон из сессии (если есть)
     applied_code = request.session.get("applied_coupon_code", "")
@@ -64,10 +57,6 @@ def checkout(request):
     if applied_code:
         initial["promo_code"] = applied_code
 
-    # значения по умолчанию для отображения
-    coupon = None
-    discount_total = Decimal("0.00")
-
     if request.method == "POST":
         action = (request.POST.get("action") or "").strip()  # "apply" или "place"
         form = CheckoutForm(request.POST)
@@ -83,19 +72,10 @@ def checkout(request):
                 request.session.pop("applied_coupon_code", None)
             else:
                 request.session["applied_coupon_code"] = coupon.code
-                discount_total = _calc_discount(subtotal, coupon)
                 messages.success(request, "The promocode has been applied.")
 
-            total = (subtotal - discount_total + shipping_total).quantize(Decimal("0.01"))
-            return render(request, "orders/checkout.html", {
-                "form": form,  # показываем то, что ввёл пользователь
-                "items": items,
-                "subtotal": subtotal,
-                "shipping_total": shipping_total,
-                "discount_total": discount_total,
-                "total": total,
-                "applied_code": request.session.get("applied_coupon_code", ""),
-            })
+            # показываем то, что ввёл пользователь
+            return _render_checkout(request, form, get_pricing(request, coupon))
 
         # 2) Оформление заказа — валидируем форму и создаём заказ
         if action == "place":
@@ -106,78 +86,36 @@ def checkout(request):
                 # финальное определение купона: приоритет — то, что ввёл пользователь; иначе — купон из сессии
                 promo_code = (form.cleaned_data.get("promo_code") or "").strip()
                 coupon = None
-                discount_total = Decimal("0.00")
 
                 if promo_code:
                     coupon, err = _get_valid_coupon_or_none(promo_code, request.user, email, subtotal)
                     if coupon is None:
                         messages.error(request, err)
-                        total = (subtotal - discount_total + shipping_total).quantize(Decimal("0.01"))
-                        return render(request, "orders/checkout.html", {
-                            "form": form,
-                            "items": items,
-                            "subtotal": subtotal,
-                            "shipping_total": shipping_total,
-                            "discount_total": discount_total,
-                            "total": total,
-                            "applied_code": request.session.get("applied_coupon_code", ""),
-                        })
-                    discount_total = _calc_discount(subtotal, coupon)
+                        return _render_checkout(request, form, pricing)
                     request.session["applied_coupon_code"] = coupon.code
                 elif applied_code:
                     # в форме промокод пуст, но в сессии есть — пытаемся применить его
                     coupon, _ = _get_valid_coupon_or_none(applied_code, request.user, email, subtotal)
-                    if coupon:
-                        discount_total = _calc_discount(subtotal, coupon)
 
-                if not items:
+                if not pricing.items:
                     messages.error(request, "The shopping cart is empty.")
                     return redirect("cart:detail")
 
-                total = (subtotal - discount_total + shipping_total).quantize(Decimal("0.01"))
-                if total < 0:
-                    total = Decimal("0.00")
-
-                with transaction.atomic():
-                    # ВАЖНО: адреса и способ доставки уже соберутся в save() формы
-                    order = form.save(commit=False)
-                    if request.user.is_authenticated:
-                        order.user = request.user
-                    else:
-                        order.guest_email = form.cleaned_data['email']
-                    order.status = Order.Status.PENDING
-                    order.total = total
-                    order.discount_total = discount_total
-                    order.shipping_total = shipping_total
-                    order.currency = "GEL"
-                    order.coupon = coupon
-                    order.placed_at = timezone.now()
-                    order.save()
-
-                    # переноcим позиции корзины
-                    for it in items:
-                        OrderItem.objects.create(
-                            order=order,
-                            product=it.product,
-                            title_snapshot=(it.product.safe_translation_getter("title", any_language=True) or str(it.product)),
-                            qty=it.qty,
-                            unit_price_snapshot=it.unit_price_snapshot,
-                        )
-                        if it.product.in_stock >= it.qty:
-                            it.product.in_stock -= it.qty
-                            it.product.save(update_fields=["in_stock", "updated_at"])
-
-                    # очищаем корзину
-                    cart.items.all().delete()
-
-                # письмо — опционально
-                # try:
-                #     context = {"order": order, "request_scheme": request.scheme, "request_host": request.get_host()}
-                #     send_order_placed_email.delay(order.id, order.email, context)
-                # except Exception:
-                #     pass
-                # send_order_created_email.delay(order.id)
-                send_order_created_email(order.id)
+                priced = get_pricing(request, coupon)
+                try:
+                    order = place_order(
+                        form, get_cart_backend(request), priced.items, user=request.user, coupon=coupon,
+                        total=priced.total, discount_total=priced.discount_total, shipping_total=priced.shipping_total,
+                    )
+                except stock.OutOfStock:
+                    messages.error(request, "Some products are no longer available in the requested quantity.")
+                    return redirect("cart:detail")
+                except coupons.CouponUnavailable as exc:
+                    messages.error(request, str(exc))
+                    request.session.pop("applied_coupon_code", None)
+                    return redirect("orders:checkout")
+
+                # письмо о заказе поставлено в outbox внутри place_order
                 messages.success(request, "The order has been created. Thanks!")
                 return redirect("orders:success", pk=order.pk)
 
@@ -185,22 +123,11 @@ def checkout(request):
     else:
         form = CheckoutForm(initial=initial)
 
-    # GET или неуспешный POST: пересчёт скидки по купону из сессии (если есть)
+    # GET или неуспешный POST: скидка по купону из сессии (если есть)
+    coupon = None
     if applied_code:
         coupon, err = _get_valid_coupon_or_none(applied_code, request.user, initial.get("email", ""), subtotal)
-        if coupon:
-            discount_total = _calc_discount(subtotal, coupon)
-
-    total = (subtotal - discount_total + shipping_total).quantize(Decimal("0.01"))
-    return render(request, "orders/checkout.html", {
-        "form": form,
-        "items": items,
-        "subtotal": subtotal,
-        "shipping_total": shipping_total,
-        "discount_total": discount_total,
-        "total": total,
-        "applied_code": request.session.get("applied_coupon_code", "") or "",
-    })
+    return _render_checkout(request, form, get_pricing(request, coupon))
 
 @login_required
 def order_track(request, pk: int):
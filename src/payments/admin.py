@@ -1,3 +1,10 @@
 from django.contrib import admin
+from .models import WebhookEvent
 
-# Register your models here.
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ("event_id", "provider", "received_at", "processed_at", "attempts")
+    list_filter = ("provider",)
+    search_fields = ("event_id",)
+    readonly_fields = ("provider", "event_id", "payload", "received_at", "processed_at", "attempts", "last_error")
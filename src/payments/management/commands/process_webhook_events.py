@@ -0,0 +1,11 @@
+from config.background import BatchCommand
+from payments.webhooks import PROCESS_BATCH, process_pending
+
+
+class Command(BatchCommand):
+    help = "Применяет необработанные вебхуки оплаты (для запуска по cron без Celery Beat)."
+    batch_size = PROCESS_BATCH
+    result_label = "Applied"
+
+    def run(self, batch_size: int) -> int:
+        return process_pending(batch_size=batch_size)
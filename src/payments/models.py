@@ -1,3 +1,31 @@
 from django.db import models
+from django.utils.translation import gettext_lazy as _
 
-# Create your models here.
+
+class WebhookEvent(models.Model):
+    """
+    Сырое событие от платёжного провайдера. Только добавляется: повторная
+    доставка того же event_id упирается в уникальный индекс. Применяет
+    событие воркер (payments.webhooks), отмечая processed_at.
+    """
+    provider = models.CharField(max_length=32)
+    event_id = models.CharField(max_length=128)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = _("Webhook event")
+        verbose_name_plural = _("Webhook events")
+        constraints = [
+            models.UniqueConstraint(fields=["provider", "event_id"], name="uniq_webhook_provider_event"),
+        ]
+        indexes = [
+            # очередь необработанных событий
+            models.Index(fields=["received_at"], name="webhook_unprocessed_idx", condition=models.Q(processed_at__isnull=True)),
+        ]
+
+    def __str__(self):
+        return f"{self.provider}:{self.event_id}"
@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from .webhooks import process_pending
+
+
+@shared_task
+def process_webhook_events():
+    """Применяет принятые вебхуки оплаты; ставится после приёма и раз в минуту из Beat"""
+    return process_pending()
@@ -1,3 +1,91 @@
-from django.test import TestCase
+import hashlib
+import hmac
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from orders import stock
+from orders.models import Order
+from orders.tests import OrderFlowTestCase
+from payments import webhooks
+from payments.models import WebhookEvent
+
+
+def _sign(order_id, status="paid") -> str:
+    secret = settings.PAYMENTS["MOCKPAY_WEBHOOK_SECRET"].encode()
+    return hmac.new(secret, f"{order_id}|{status}".encode(), hashlib.sha256).hexdigest()
+
+
+@override_settings(PAYMENT_WEBHOOKS_ASYNC=False, OUTBOX_ASYNC=False)
+class WebhookTests(OrderFlowTestCase):
+    def payload(self, order):
+        return {"order_id": str(order.pk), "status": "paid"}
+
+    def post(self, order, signature=None, event_id="evt_1"):
+        return self.client.post(reverse("payments:mockpay_webhook"), {
+            "order_id": order.pk, "status": "paid",
+            "signature": signature or _sign(order.pk), "event_id": event_id,
+        })
+
+    def status_of(self, order):
+        return Order.objects.get(pk=order.pk).status
+
+    def test_duplicate_event_is_noop(self):
+        order = self.place([1, 0])
+        with self.captureOnCommitCallbacks(execute=True):
+            webhooks.ingest(webhooks.MOCKPAY, "evt_1", self.payload(order))
+        with self.captureOnCommitCallbacks(execute=True):
+            webhooks.ingest(webhooks.MOCKPAY, "evt_1", {"order_id": "0", "status": "paid"})
+        event = WebhookEvent.objects.get()
+        self.assertEqual(event.payload, self.payload(order))
+        self.assertEqual(event.attempts, 1)
+        self.assertEqual(self.status_of(order), Order.Status.PAID)
+
+    def test_failure_rolls_back_claim_and_leaves_event_for_retry(self):
+        order = self.place([1, 0])
+        event = WebhookEvent.objects.create(provider=webhooks.MOCKPAY, event_id="evt_1", payload=self.payload(order))
+        with mock.patch.dict(webhooks.APPLY, {webhooks.MOCKPAY: mock.Mock(side_effect=RuntimeError("boom"))}):
+            self.assertFalse(webhooks.process(event.pk))
+        event.refresh_from_db()
+        self.assertIsNone(event.processed_at)
+        self.assertEqual(event.attempts, 1)
+        self.assertIn("boom", event.last_error)
+        self.assertEqual(self.status_of(order), Order.Status.PENDING)
+        # следующий проход применяет событие
+        self.assertEqual(webhooks.process_pending(), 1)
+        self.assertEqual(self.status_of(order), Order.Status.PAID)
+
+    def test_out_of_stock_keeps_order_pending(self):
+        order = self.place([2, 0])
+        # резерв истёк, товар раскупили — оплата не может списать его заново
+        stock.release_expired(now=timezone.now() + stock.reservation_ttl() + timedelta(seconds=1))
+        self.place([1, 0], email="other@example.com")
+        event = WebhookEvent.objects.create(provider=webhooks.MOCKPAY, event_id="evt_1", payload=self.payload(order))
+        self.assertFalse(webhooks.process(event.pk))
+        event.refresh_from_db()
+        self.assertIsNone(event.processed_at)
+        self.assertIn("OutOfStock", event.last_error)
+        self.assertEqual(self.status_of(order), Order.Status.PENDING)
+        self.assertEqual(self.stock_of(), [1, 1])
+
+    def test_inline_kick_applies_only_received_event(self):
+        backlog, order = self.place([1, 0]), self.place([0, 1])
+        WebhookEvent.objects.create(provider=webhooks.MOCKPAY, event_id="evt_old", payload=self.payload(backlog))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post(order)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.status_of(order), Order.Status.PAID)
+        self.assertEqual(self.status_of(backlog), Order.Status.PENDING)
+        self.assertTrue(WebhookEvent.objects.filter(event_id="evt_old", processed_at__isnull=True).exists())
+
+    def test_bad_signature_is_rejected(self):
+        order = self.place([1, 0])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post(order, signature="0" * 64)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(WebhookEvent.objects.exists())
+        self.assertEqual(self.status_of(order), Order.Status.PENDING)
@@ -3,11 +3,13 @@ import hmac
 import hashlib
 from django.conf import settings
 from django.contrib import messages
+from django.http import HttpResponse, HttpResponseBadRequest
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from django.utils import timezone
+from orders import state, stock
 from orders.models import Order
-from orders.tasks import send_order_paid_email_task
+from . import webhooks
 
 def _order_accessible(request, order: Order) -> bool:
     # Авторизованный видит свои заказы, гость — по id (для демо). В проде добавьте токен-доступ по email/кодам.
@@ -21,28 +23,22 @@ def pay_page(request, order_id: int):
     if not _order_accessible(request, order):
         messages.error(request, "There is no access to the order.")
         return redirect("cms:home")
-    if order.status not in (Order.Status.PENDING, Order.Status.PROCESSING):
+    if not state.can_transition(order, Order.Status.PAID):
         messages.info(request, "This order no longer requires payment.")
         return redirect("orders:track", pk=order.id)
 
     if request.method == "POST":
-        # Мок-оплата: сразу переводим в PAID и ставим placed_at, если нужно
-        order.status = Order.Status.PAID
-        if not order.placed_at:
-            order.placed_at = timezone.now()
-        order.save(update_fields=["status", "placed_at", "updated_at"])
-        messages.success(request, "The payment was successful.")
-        context = {
-            "order": order,
-            "request_scheme": request.scheme,
-            "request_host": request.get_host(),
-        }
+        # Мок-оплата: условный переход в PAID; если вебхук успел раньше — письмо уже ушло от него
         try:
-            # send_order_paid_email.delay(order.id, order.email, context)
-            # send_order_paid_email_task.delay(order.id)
-            send_order_paid_email_task(order.id)
-        except Exception as e:
-            pass
+            paid = state.transition(order, Order.Status.PAID)
+        except stock.OutOfStock:
+            # резерв истёк, а товар за это время раскупили
+            messages.error(request, "Some items in this order are no longer in stock.")
+            return redirect("orders:track", pk=order.id)
+        if not paid:
+            messages.info(request, "This order no longer requires payment.")
+            return redirect("orders:track", pk=order.id)
+        messages.success(request, "The payment was successful.")
         return redirect("orders:track", pk=order.id)
 
     return render(request, "payments/pay_page.html", {"order": order})
@@ -56,34 +52,29 @@ def mockpay_return(request):
         return redirect("cms:home")
     return redirect("orders:track", pk=int(oid))
 
+@csrf_exempt
 @require_http_methods(["POST"])
 def mockpay_webhook(request):
     """
     Пример вебхука:
     - ожидаем поля: order_id, status, signature (HMAC SHA256 по "order_id|status" с секретом)
-    - если status == "paid" и подпись корректна — ставим заказ в PAID
+      и необязательный event_id (иначе ключом события служит подпись)
+    - событие сохраняется и сразу подтверждается; заказ меняет воркер (payments.webhooks)
     """
     order_id = request.POST.get("order_id", "")
     status = request.POST.get("status", "")
     signature = request.POST.get("signature", "")
 
     if not (order_id.isdigit() and status and signature):
-        return render(request, "payments/webhook_result.txt", {"text": "bad_request"}, content_type="text/plain")
+        return HttpResponseBadRequest("bad_request", content_type="text/plain")
 
     msg = f"{order_id}|{status}".encode()
     secret = settings.PAYMENTS["MOCKPAY_WEBHOOK_SECRET"].encode()
     digest = hmac.new(secret, msg, hashlib.sha256).hexdigest()
 
     if not hmac.compare_digest(digest, signature):
-        return render(request, "payments/webhook_result.txt", {"text": "invalid_signature"}, content_type="text/plain")
-
-    order = get_object_or_404(Order, pk=int(order_id))
-
-    if status == "paid" and order.status == Order.Status.PENDING:
-        order.status = Order.Status.PAID
-        if not order.placed_at:
-            order.placed_at = timezone.now()
-        order.save(update_fields=["status", "placed_at", "updated_at"])
-        return render(request, "payments/webhook_result.txt", {"text": "ok"}, content_type="text/plain")
+        return HttpResponseBadRequest("invalid_signature", content_type="text/plain")
 
-    return render(request, "payments/webhook_result.txt", {"text": "noop"}, content_type="text/plain")
+    event_id = (request.POST.get("event_id") or signature)[:128]
+    webhooks.ingest(webhooks.MOCKPAY, event_id, {"order_id": order_id, "status": status})
+    return HttpResponse("ok", content_type="text/plain")
@@ -0,0 +1,89 @@
+# payments/webhooks.py
+"""
+Приём и обработка вебхуков оплаты.
+
+Вьюха только проверяет подпись и сохраняет событие одним INSERT ... ON
+CONFLICT DO NOTHING по (provider, event_id) — повторная доставка стоит один
+конфликт уникального индекса. Состояние заказа меняет воркер: process()
+захватывает событие условным UPDATE processed_at и в той же транзакции
+переводит заказ в PAID через orders.state (резерв и письмо — там же).
+Упало — транзакция откатывается, событие останется необработанным для
+следующего прохода.
+
+Без Celery (PAYMENT_WEBHOOKS_ASYNC выключен) или при недоступном брокере
+после коммита сразу применяется только принятое событие (config.background); повторы упавших разбирает
+process_pending() из Beat или команда process_webhook_events по cron.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from config.background import run_after_commit
+from orders import state
+from orders.models import Order
+from .models import WebhookEvent
+
+logger = logging.getLogger(__name__)
+
+MOCKPAY = "mockpay"
+PROCESS_BATCH = 100
+MAX_ATTEMPTS = 10
+
+
+def ingest(provider: str, event_id: str, payload: dict) -> None:
+    """Сохраняет событие (дубликат игнорируется) и после коммита запускает обработку."""
+    WebhookEvent.objects.bulk_create(
+        [WebhookEvent(provider=provider, event_id=event_id, payload=payload)],
+        ignore_conflicts=True,
+    )
+    run_after_commit(
+        "PAYMENT_WEBHOOKS_ASYNC", "payments.tasks.process_webhook_events",
+        inline=lambda: _process_received(provider, event_id),
+    )
+
+
+def _process_received(provider: str, event_id: str) -> None:
+    # в запросе — только это событие, очередь целиком запрос не разбирает
+    pk = (
+        WebhookEvent.objects.filter(provider=provider, event_id=event_id, processed_at__isnull=True)
+        .values_list("pk", flat=True).first()
+    )
+    if pk is not None:
+        process(pk)
+
+
+def _apply_mockpay(payload: dict) -> None:
+    if payload.get("status") == "paid":
+        state.transition(Order(pk=int(payload["order_id"])), Order.Status.PAID)
+
+
+APPLY = {MOCKPAY: _apply_mockpay}
+
+
+def process(event_id: int) -> bool:
+    """Применяет одно событие, если удалось его захватить. True — применено."""
+    try:
+        with transaction.atomic():
+            claimed = WebhookEvent.objects.filter(pk=event_id, processed_at__isnull=True).update(
+                processed_at=timezone.now(), attempts=F("attempts") + 1,
+            )
+            if not claimed:
+                return False
+            event = WebhookEvent.objects.get(pk=event_id)
+            APPLY[event.provider](event.payload)
+    except Exception as exc:
+        WebhookEvent.objects.filter(pk=event_id).update(attempts=F("attempts") + 1, last_error=repr(exc)[:2000])
+        logger.warning("Webhooks: event %s failed", event_id, exc_info=True)
+        return False
+    return True
+
+
+def process_pending(batch_size: int = PROCESS_BATCH) -> int:
+    """Обрабатывает необработанные события по порядку поступления. Возвращает число применённых."""
+    ids = list(
+        WebhookEvent.objects.filter(processed_at__isnull=True, attempts__lt=MAX_ATTEMPTS)
+        .order_by("received_at").values_list("pk", flat=True)[:batch_size]
+    )
+    return sum(1 for event_id in ids if process(event_id))
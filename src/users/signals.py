@@ -0,0 +1,13 @@
+# users/signals.py
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from orders.claims import schedule_claim
+
+
+@receiver(post_save, sender=get_user_model())
+def claim_guest_orders_on_signup(sender, instance, created, **kwargs):
+    # гостевые заказы с этим e-mail привяжутся в фоне
+    if created and instance.email:
+        schedule_claim(instance)
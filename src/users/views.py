@@ -3,15 +3,44 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import login
 # from django.contrib.auth.forms import UserCreationForm
 from django.http import HttpResponse, HttpResponseBadRequest
+from django.core.cache import cache
 from django.template.loader import render_to_string
+from django.utils.translation import get_language
 
-from orders.models import Order
+from orders import history
 from .forms import ProfileForm, CustomUserCreationForm
 
+ORDERS_TAB_TTL = 60 * 60
+
+
+def _cursor(request) -> str:
+    before = request.GET.get("before", "")
+    return before if history.decode_cursor(before) else ""
+
+
+def _orders_context(request) -> dict:
+    before = _cursor(request)
+    orders, next_cursor = history.page(request.user, before)
+    return {"orders": orders, "next_cursor": next_cursor, "before": before}
+
+
+def _orders_tab_html(request) -> str:
+    """
+    Вкладка «Мои заказы» (страница по курсору ?before=). Отрисованный HTML
+    кэшируется на пользователя; ключ включает history.stamp(), поэтому новый
+    заказ или смена статуса сразу дают свежую вкладку.
+    """
+    key = f"account:orders:{request.user.pk}:{history.stamp(request.user)}:{get_language()}:{_cursor(request)}"
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string("users/_tab_orders.html", _orders_context(request), request=request)
+        cache.set(key, html, ORDERS_TAB_TTL)
+    return html
+
+
 @login_required
 def my_orders(request):
-    qs = Order.objects.filter(user=request.user).order_by("-created_at")
-    return render(request, "users/my_orders.html", {"orders": qs})
+    return render(request, "users/my_orders.html", _orders_context(request))
 
 
 def signup(request):
@@ -22,22 +51,7 @@ def signup(request):
         form = CustomUserCreationForm(request.POST)
         if form.is_valid():
             user = form.save()
-            # ---> НАЧАЛО НОВОЙ ЛОГИКИ <---
-
-            # Получаем email, который пользователь ввел при регистрации
-            user_email = form.cleaned_data.get('email')
-
-            if user_email:
-                # 1. Находим все "гостевые" заказы с этим email
-                guest_orders = Order.objects.filter(
-                    guest_email__iexact=user_email,  # iexact для регистронезависимого поиска
-                    user__isnull=True  # Убедимся, что заказы еще не привязаны
-                )
-                # 2. Привязываем найденные заказы к новому пользователю
-                guest_orders.update(user=user)
-
-            # ---> КОНЕЦ НОВОЙ ЛОГИКИ <---
-
+            # гостевые заказы с этим e-mail привязываются в фоне (users.signals → orders.claims)
             login(request, user)
             # Теперь редирект на страницу, где пользователь увидит свои заказы
             return redirect("users:account_hub")  # <-- Рекомендую редиректить сюда
@@ -55,9 +69,7 @@ def account_hub(request):
         tab = "orders"
     # Загружаем содержимое активной вкладки сразу (SSR), чтобы без «мигания»
     if tab == "orders":
-        tab_html = render_to_string("users/_tab_orders.html", {
-            "orders": Order.objects.filter(user=request.user).order_by("-created_at")
-        }, request=request)
+        tab_html = _orders_tab_html(request)
     else:
         form = ProfileForm(user=request.user)
         tab_html = render_to_string("users/_tab_profile.html", {"form": form}, request=request)
@@ -68,10 +80,7 @@ def account_hub(request):
 def account_tab_orders(request):
     if request.method != "GET":
         return HttpResponseBadRequest("GET only")
-    html = render_to_string("users/_tab_orders.html", {
-        "orders": Order.objects.filter(user=request.user).order_by("-created_at")
-    }, request=request)
-    return HttpResponse(html)
+    return HttpResponse(_orders_tab_html(request))
 
 @login_required
 def account_tab_profile(request):